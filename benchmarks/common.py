@@ -0,0 +1,34 @@
+import os
+import statistics
+import sys
+import time
+
+import django
+
+sys.path.append(os.path.join(os.path.realpath(os.path.dirname(__file__)), ".."))
+
+
+def setup(**overrides):
+    """
+    Configures Django, with any setting `overrides`, and switches to a
+    throwaway (in-memory) database.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_article.settings")
+    django.setup()
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    if overrides:
+        override_settings(**overrides).enable()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def measure(fn, repeat=20):
+    """Returns the median wall time of `fn` in seconds, after one warm-up call."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
@@ -0,0 +1,82 @@
+"""
+Deterministic synthetic data for the benchmarks. Run as a module to seed a
+database file for servers started by hand, e.g.
+
+    python -m benchmarks.dataset /tmp/bench.sqlite3 --articles 100000
+    BENCHMARK_DB=/tmp/bench.sqlite3 DJANGO_SETTINGS_MODULE=benchmarks.settings uvicorn django_article.asgi:application
+"""
+import argparse
+import os
+import random
+
+from django_article.vocabulary import FIRST_NAMES, LAST_NAMES, REGION_CODES, WORDS
+
+
+def generate(articles, regions, authors, regions_per_article=2, seed=0, batch_size=5000):
+    """
+    Seeds a deterministic synthetic dataset: `regions` regions, `authors`
+    authors and `articles` articles, each linked to `regions_per_article`
+    random regions and (nine times out of ten) a random author.
+    """
+    from django_article.articles.models import Article
+    from django_article.authors.models import Author
+    from django_article.regions.models import Region
+
+    rng = random.Random(seed)
+    Region.objects.bulk_create(
+        [Region(id=i + 1, code=code, name=f"Region {code}") for i, code in enumerate(REGION_CODES[:regions])],
+        batch_size=batch_size,
+    )
+    Author.objects.bulk_create(
+        [
+            Author(id=i + 1, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+            for i in range(authors)
+        ],
+        batch_size=batch_size,
+    )
+    through = Article.regions.through
+    fanout = min(regions_per_article, regions)
+    for start in range(0, articles, batch_size):
+        ids = range(start + 1, min(start + batch_size, articles) + 1)
+        Article.objects.bulk_create(
+            [
+                Article(
+                    id=i,
+                    title=f"Article {i} {' '.join(rng.sample(WORDS, 4))}",
+                    content=" ".join(rng.choices(WORDS, k=60)),
+                    author_id=rng.randint(1, authors) if authors and rng.random() < 0.9 else None,
+                )
+                for i in ids
+            ]
+        )
+        through.objects.bulk_create(
+            [
+                through(article_id=i, region_id=region_id)
+                for i in ids
+                for region_id in rng.sample(range(1, regions + 1), fanout)
+            ]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database")
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--regions", type=int, default=50)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["BENCHMARK_DB"] = args.database
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+    generate(args.articles, args.regions, args.authors, regions_per_article=args.fanout, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Encode time and bytes on the wire of large article lists: the previous
+`json.dumps` defaults next to the compact stdlib and orjson encoders, then
+gzip and brotli (when installed) at the levels the middleware uses.
+
+    python -m benchmarks.encoding --articles 20000
+"""
+import argparse
+import json
+import time
+import zlib
+
+from benchmarks import common, dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    common.setup()
+    from django_article import encoders, middleware
+    from django_article.articles.models import Article
+    from django_article.articles.schemas import article_serializer
+
+    dataset.generate(args.articles, regions=200, authors=1000, regions_per_article=3)
+    encoder_cases = (
+        ("json.dumps defaults", lambda data: json.dumps(data).encode()),
+        ("stdlib compact", encoders.stdlib_encode),
+        ("orjson", encoders.orjson_encode if encoders.orjson else None),
+    )
+    print(f"{'page':>6} {'encoder':<20} {'encode ms':>10} {'bytes':>11}")
+    for page in (100, 1000, args.articles):
+        data = article_serializer.dump(Article.objects.order_by("pk")[:page])
+        for name, encode in encoder_cases:
+            if encode is None:
+                continue
+            elapsed = common.measure(lambda: encode(data), args.repeat)
+            print(f"{page:>6} {name:<20} {elapsed * 1000:>10.2f} {len(encode(data)):>11}")
+
+    body = encoders.stdlib_encode(article_serializer.dump(Article.objects.order_by("pk")[:1000]))
+    print(f"\n{'1000 articles':<20} {'compress ms':>11} {'bytes':>11}")
+    print(f"{'identity':<20} {0:>11.2f} {len(body):>11}")
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and middleware.brotli is None:
+            continue
+        elapsed = common.measure(lambda: middleware.Compressor(encoding).whole(body), args.repeat)
+        print(f"{encoding:<20} {elapsed * 1000:>11.2f} {len(middleware.Compressor(encoding).whole(body)):>11}")
+
+    # Streamed: one flush per batch of STREAMING_CHUNK_SIZE rows
+    chunks = [body[i:i + 50_000] for i in range(0, len(body), 50_000)]
+    start = time.perf_counter()
+    compressor = middleware.Compressor("gzip")
+    streamed = b"".join(compressor.iterate(chunks))
+    elapsed = time.perf_counter() - start
+    assert zlib.decompress(streamed, 16 + zlib.MAX_WBITS) == body
+    print(f"{'gzip, streamed':<20} {elapsed * 1000:>11.2f} {len(streamed):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Times the hot access paths before and after the indexes of
+articles 0005 and 0006 and authors 0003, on a database seeded by setup_and_seed.py
+or benchmarks.dataset. The migrations are rolled back and applied again
+in place, so run it on a copy you do not mind rebuilding indexes on.
+
+    BENCHMARK_DB=/tmp/big.sqlite3 DJANGO_SETTINGS_MODULE=benchmarks.settings \
+        python setup_and_seed.py --articles 1_000_000 --regions 250 --authors 100_000
+    python -m benchmarks.indexes /tmp/big.sqlite3
+"""
+import argparse
+import os
+import random
+
+from benchmarks import common
+
+BEFORE = [("articles", "0004_article_search_index"), ("authors", "0002_author_updated_at_version")]
+AFTER = [("authors", "0003_author_author_name_idx"), ("articles", "0006_drop_through_prefix_indexes")]
+
+
+def access_paths(rng, regions, authors):
+    from django_article.articles.models import Article
+    from django_article.authors.models import Author
+    from django_article.regions.lookup import region_lookup
+
+    through = Article.regions.through
+    codes = [region.code for region in region_lookup.page(0, regions)]
+
+    def page(queryset, after=0):
+        return list(queryset.filter(pk__gt=after).order_by("pk").values_list("pk", flat=True)[:101])
+
+    return {
+        "region_code=2 codes (all)": lambda: page(Article.objects.filter_regions(rng.sample(codes, 2), "all")),
+        "region_code=2 codes (any)": lambda: page(Article.objects.filter_regions(rng.sample(codes, 2), "any")),
+        "region_code=1 code (none)": lambda: page(Article.objects.filter_regions(rng.sample(codes, 1), "none")),
+        "region's articles, page": lambda: page(Article.objects.filter(regions=rng.randint(1, regions))),
+        "region's articles, deep page": lambda: page(
+            Article.objects.filter(regions=rng.randint(1, regions)), after=rng.randint(0, 900_000)
+        ),
+        "region's article count": lambda: through.objects.filter(region_id=rng.randint(1, regions)).count(),
+        "author's articles, page": lambda: page(Article.objects.filter(author=rng.randint(1, authors))),
+        "author's article count": lambda: Article.objects.filter(author=rng.randint(1, authors)).count(),
+        "authors by last name": lambda: list(
+            Author.objects.filter(last_name="Tanner").order_by("first_name").values_list("id", flat=True)[:100]
+        ),
+        # A miss reads every candidate row
+        "author by full name, missing": lambda: Author.objects.filter(last_name="Tanner", first_name="Nobody").exists(),
+    }
+
+
+def measure_all(paths, repeat, runs=3):
+    # Best of a few medians, as the page cache makes single runs noisy
+    return {name: min(common.measure(path, repeat) for _ in range(runs)) for name, path in paths.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["BENCHMARK_DB"] = args.database
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    from django_article.authors.models import Author
+    from django_article.regions.models import Region
+
+    regions, authors = Region.objects.count(), Author.objects.count()
+    timings = []
+    for targets in (BEFORE, AFTER):
+        for app, migration in targets:
+            call_command("migrate", app, migration, verbosity=0)
+        # The same random samples before and after
+        timings.append(measure_all(access_paths(random.Random(0), regions, authors), args.repeat))
+
+    print(f"{'access path':<32} {'before':>10} {'after':>10}  (ms, median)")
+    for name in timings[0]:
+        print(f"{name:<32} {timings[0][name] * 1000:>10.2f} {timings[1][name] * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
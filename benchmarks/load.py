@@ -0,0 +1,183 @@
+"""
+Load test of the WSGI (gunicorn, gthread workers) and ASGI (uvicorn)
+deployments: requests per second and latency percentiles with `--connections`
+concurrent keep-alive connections, spread over `--clients` processes.
+A `--writes` share of the requests PATCH an article instead of reading.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load --connections 1000 --duration 20
+
+`--sqlite untuned tuned` runs every server twice: with SQLite's defaults
+and a connection per request, then with the SQLITE_PRAGMAS and persistent
+connections of the settings, e.g. to see readers no longer wait on writers:
+
+    python -m benchmarks.load wsgi --connections 50 --writes 0.1 --sqlite untuned tuned
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVERS = {
+    "wsgi": [
+        sys.executable, "-m", "gunicorn", "django_article.wsgi:application", "--worker-class", "gthread",
+        "--workers", "{workers}", "--threads", "{threads}", "--bind", "127.0.0.1:{port}",
+        "--backlog", "4096", "--log-level", "warning",
+    ],
+    "asgi": [
+        sys.executable, "-m", "uvicorn", "django_article.asgi:application", "--workers", "{workers}",
+        "--port", "{port}", "--backlog", "4096", "--no-access-log", "--log-level", "warning",
+    ],
+}
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    headers = dict(
+        line.split(b": ", 1) for line in head.split(b"\r\n")[1:] if b": " in line
+    )
+    headers = {name.lower(): value for name, value in headers.items()}
+    if b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+    elif headers.get(b"transfer-encoding") == b"chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+def write_request(rng, articles):
+    body = json.dumps({"title": f"Article {rng.random()}"}).encode()
+    head = (
+        f"PATCH /articles/{rng.randint(1, articles)} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def connection(port, paths, writes, articles, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random()
+    try:
+        while time.monotonic() < deadline:
+            if rng.random() < writes:
+                writer.write(write_request(rng, articles))
+            else:
+                writer.write(f"GET {rng.choice(paths)} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            start = time.perf_counter()
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    except (OSError, asyncio.IncompleteReadError):
+        errors.append("connection")
+    finally:
+        writer.close()
+
+
+def client(port, connections, paths, writes, articles, duration, results):
+    async def run():
+        latencies, errors = [], []
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *(connection(port, paths, writes, articles, deadline, latencies, errors) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        return latencies, errors
+
+    results.put(asyncio.run(run()))
+
+
+def load(port, args, paths):
+    results = multiprocessing.Queue()
+    per_client = [args.connections // args.clients + (i < args.connections % args.clients) for i in range(args.clients)]
+    processes = [
+        multiprocessing.Process(
+            target=client, args=(port, count, paths, args.writes, args.articles, args.duration, results)
+        )
+        for count in per_client
+    ]
+    for process in processes:
+        process.start()
+    latencies, errors = [], []
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies += client_latencies
+        errors += client_errors
+    for process in processes:
+        process.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--writes", type=float, default=0, help="share of requests that are writes")
+    parser.add_argument("--sqlite", nargs="+", choices=("tuned", "untuned"), default=["tuned"])
+    parser.add_argument("servers", nargs="*", default=list(SERVERS))
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections * 2 + 64)), hard))
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "db.sqlite3")
+    subprocess.run([sys.executable, "-m", "benchmarks.dataset", path, "--articles", str(args.articles)], check=True)
+    paths = ["/articles?limit=20", "/authors?limit=20", "/regions"] + [
+        f"/articles/{random.randint(1, args.articles)}" for _ in range(50)
+    ]
+
+    print(f"{args.connections} connections, {args.writes:.0%} writes, {args.duration:.0f}s, {args.workers} worker(s)")
+    print(f"{'server':<6} {'sqlite':<8} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in args.servers:
+        for profile in args.sqlite:
+            env = dict(
+                os.environ, BENCHMARK_DB=path, BENCHMARK_SQLITE=profile, DJANGO_SETTINGS_MODULE="benchmarks.settings"
+            )
+            command = [
+                part.format(workers=args.workers, threads=args.threads, port=args.port) for part in SERVERS[name]
+            ]
+            server = subprocess.Popen(command, env=env)
+            try:
+                wait_for(args.port)
+                latencies, errors = load(args.port, args, paths)
+            finally:
+                server.terminate()
+                server.wait()
+            percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+            print(
+                f"{name:<6} {profile:<8} {len(latencies):>9} {len(latencies) / args.duration:>9.0f} "
+                f"{percentiles[49] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f} {len(errors):>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
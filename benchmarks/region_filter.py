@@ -0,0 +1,62 @@
+"""
+Times the first page of `/articles?region_code=...` for each `region_match`
+mode as the number of codes grows, next to the GROUP BY/HAVING and IN
+subquery formulations for comparison.
+
+    python -m benchmarks.region_filter --articles 100000 --regions 50
+"""
+import argparse
+
+from benchmarks import common, dataset
+
+
+def grouped_all(queryset, codes):
+    from django.db.models import Count
+
+    links = (
+        queryset.model.regions.through.objects.filter(region__code__in=codes)
+        .values("article_id")
+        .annotate(matched=Count("region_id", distinct=True))
+        .filter(matched=len(codes))
+    )
+    return queryset.filter(id__in=links.values("article_id"))
+
+
+def in_subquery_any(queryset, codes):
+    links = queryset.model.regions.through.objects.filter(region__code__in=codes)
+    return queryset.filter(id__in=links.values("article_id"))
+
+
+def first_page(queryset):
+    return list(queryset.filter(pk__gt=0).order_by("pk").values_list("pk", flat=True)[:101])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--regions", type=int, default=50)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    common.setup()
+    from django_article.articles.models import Article
+
+    dataset.generate(args.articles, args.regions, authors=1000, regions_per_article=args.fanout)
+    columns = ("having", "all", "in", "any", "none")
+    print(f"{'codes':>5} " + " ".join(f"{c:>8}" for c in columns) + "  (ms, median)")
+    for count in (1, 2, 4, 8, 16):
+        codes = dataset.REGION_CODES[:count]
+        querysets = (
+            grouped_all(Article.objects.all(), codes),
+            Article.objects.filter_regions(codes, "all"),
+            in_subquery_any(Article.objects.all(), codes),
+            Article.objects.filter_regions(codes, "any"),
+            Article.objects.filter_regions(codes, "none"),
+        )
+        timings = [common.measure(lambda: first_page(qs), args.repeat) for qs in querysets]
+        print(f"{count:>5} " + " ".join(f"{t * 1000:>8.2f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Replays the requests of docs/django-article.postman_collection.json against
+the WSGI and ASGI applications in-process (or a server over HTTP with
+--url) and reports throughput and p50/p95/p99 latency per request.
+
+Every round sends each request of the collection once, in collection order.
+Single-object reads go to random ids of the generated dataset, while each
+round's update and delete act on the object its create just made, so the
+dataset is the same after every round.
+
+    python -m benchmarks.replay --rounds 200
+    python -m benchmarks.replay --save-baseline     # write benchmarks/baseline.json
+    python -m benchmarks.replay --threshold 0.25    # exit 1 on a >25% regression
+
+Baselines are only comparable on the machine and with the options they were
+recorded with.
+"""
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from benchmarks import common, dataset
+
+COLLECTION = os.path.join(os.path.dirname(__file__), "..", "docs", "django-article.postman_collection.json")
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+Operation = namedtuple("Operation", ["name", "method", "resource", "detail", "body"])
+Response = namedtuple("Response", ["status", "body"])
+
+
+def load_operations(path=COLLECTION):
+    with open(path) as f:
+        collection = json.load(f)
+    operations = []
+    for item in collection["item"]:
+        request = item["request"]
+        segments = request["url"]["path"]
+        body = request.get("body", {}).get("raw")
+        operations.append(Operation(
+            name=item["name"],
+            method=request["method"],
+            resource=segments[0],
+            detail=len(segments) > 1,
+            body=json.loads(body) if body else None,
+        ))
+    return operations
+
+
+class WSGIClient(object):
+    def __init__(self):
+        from django.core.wsgi import get_wsgi_application
+
+        self.application = get_wsgi_application()
+
+    def __call__(self, method, path, body):
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "localhost",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        status = []
+        result = self.application(environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            content = b"".join(result)
+        finally:
+            result.close()
+        return Response(int(status[0].split(" ", 1)[0]), content)
+
+
+class ASGIClient(object):
+    def __init__(self):
+        from django.core.asgi import get_asgi_application
+
+        self.application = get_asgi_application()
+        self.loop = asyncio.new_event_loop()
+
+    def __call__(self, method, path, body):
+        return self.loop.run_until_complete(self.request(method, path, body))
+
+    async def request(self, method, path, body):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        done = asyncio.Event()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status, content = [], []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            else:
+                content.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    done.set()
+
+        await self.application(scope, receive, send)
+        done.set()
+        return Response(status[0], b"".join(content))
+
+
+class HTTPClient(object):
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+
+    def __call__(self, method, path, body):
+        self.connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        return Response(response.status, response.read())
+
+
+def replay(client, operations, rounds, counts, seed=0):
+    """Returns `{operation name: ([latencies], errors)}`."""
+    rng = random.Random(seed)
+    free_codes = dataset.REGION_CODES[counts["regions"]:]
+    results = {operation.name: ([], 0) for operation in operations}
+    for round_number in range(rounds):
+        created = {}
+        code = free_codes[round_number % len(free_codes)]
+        for operation in operations:
+            body = operation.body
+            if body is not None and operation.resource == "regions":
+                body = dict(body, code=code)
+            path = f"/{operation.resource}"
+            if operation.detail:
+                if operation.method == "GET":
+                    path += f"/{rng.randint(1, counts[operation.resource])}"
+                else:
+                    path += f"/{created.get(operation.resource, 0)}"
+            payload = json.dumps(body).encode() if body is not None else b""
+
+            start = time.perf_counter()
+            response = client(operation.method, path, payload)
+            elapsed = time.perf_counter() - start
+
+            latencies, errors = results[operation.name]
+            latencies.append(elapsed)
+            if response.status >= 400:
+                results[operation.name] = (latencies, errors + 1)
+            elif operation.method == "POST":
+                created[operation.resource] = json.loads(response.body)["id"]
+    return results
+
+
+def summarize(results):
+    summary = {}
+    for name, (latencies, errors) in results.items():
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / sum(latencies), 1),
+            "p50": round(percentiles[49] * 1000, 3),
+            "p95": round(percentiles[94] * 1000, 3),
+            "p99": round(percentiles[98] * 1000, 3),
+        }
+    return summary
+
+
+def print_report(transport, summary, baseline=None):
+    print(f"\n{transport}")
+    print(f"{'request':<24} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'vs p95':>8}")
+    for name, row in summary.items():
+        change = ""
+        if baseline and name in baseline:
+            change = f"{(row['p95'] / baseline[name]['p95'] - 1) * 100:+.0f}%"
+        print(
+            f"{name:<24} {row['rps']:>9.1f} {row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f} "
+            f"{row['errors']:>6} {change:>8}"
+        )
+
+
+def regressions(summary, baseline, threshold):
+    """Requests whose p95 latency or throughput got worse than `threshold` (a fraction)."""
+    found = []
+    for name, row in summary.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if row["p95"] > before["p95"] * (1 + threshold):
+            found.append(f"{name}: p95 {before['p95']:.2f} -> {row['p95']:.2f} ms")
+        if row["rps"] < before["rps"] / (1 + threshold):
+            found.append(f"{name}: {before['rps']:.1f} -> {row['rps']:.1f} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=("wsgi", "asgi"), nargs="*", default=["wsgi", "asgi"])
+    parser.add_argument("--url", help="replay over HTTP against a server seeded with benchmarks.dataset instead")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--regions", type=int, default=50)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    counts = {"articles": args.articles, "regions": args.regions, "authors": args.authors}
+    options = dict(counts, rounds=args.rounds, fanout=args.fanout)
+    operations = load_operations()
+    if args.url:
+        clients = {"http": lambda: HTTPClient(args.url)}
+    else:
+        # Measure the views themselves, as deployed: no debug query log, no response cache
+        common.setup(DEBUG=False, ALLOWED_HOSTS=["localhost"], RESPONSE_CACHE_ENABLED=False)
+        dataset.generate(args.articles, args.regions, args.authors, regions_per_article=args.fanout)
+        clients = {"wsgi": WSGIClient, "asgi": ASGIClient}
+        clients = {name: clients[name] for name in args.transport}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        if saved["options"] == options:
+            baseline = saved["results"]
+        else:
+            print(f"{args.baseline} was recorded with {saved['options']}, not compared")
+    summaries, found = {}, []
+    for transport, client in clients.items():
+        summaries[transport] = summarize(replay(client(), operations, args.rounds, counts))
+        print_report(transport, summaries[transport], baseline.get(transport))
+        found += [f"{transport} {regression}" for regression in regressions(
+            summaries[transport], baseline.get(transport, {}), args.threshold
+        )]
+        found += [
+            f"{transport} {name}: {row['errors']} error responses"
+            for name, row in summaries[transport].items() if row["errors"]
+        ]
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "options": options,
+                "machine": {"python": platform.python_version(), "platform": platform.platform()},
+                "results": summaries,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    elif found:
+        print(f"\nFailed, regressions beyond {args.threshold:.0%} of the baseline or errors:")
+        for regression in found:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
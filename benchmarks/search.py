@@ -0,0 +1,49 @@
+"""
+Times the first page of `/articles?q=...` through the FTS5 index next to a
+naive `icontains` scan over title and content.
+
+    python -m benchmarks.search --articles 1000000
+"""
+import argparse
+
+from benchmarks import common, dataset
+
+# Words of the generated content appear in most articles; title numbers are
+# unique and "unheard" in none, so those scans run to the end of the table.
+QUERIES = ("lorem", "magna aliqua", "reprehend*", "{middle}", "unheard")
+
+
+def icontains_page(queryset, text):
+    from django.db.models import Q
+
+    terms = text.rstrip("*").split()
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+    return list(queryset.order_by("pk").values_list("pk", flat=True)[:101])
+
+
+def search_page(queryset, text):
+    return list(queryset.search(text).order_by("rank", "pk").values_list("pk", "rank", "snippet")[:101])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup()
+    from django_article.articles.models import Article
+
+    dataset.generate(args.articles, regions=50, authors=1000)
+    print(f"{'query':<16} {'matches':>9} {'icontains':>10} {'fts5':>10}  (ms, median)")
+    for text in QUERIES:
+        text = text.format(middle=args.articles // 2)
+        matches = Article.objects.search(text).count()
+        naive = common.measure(lambda: icontains_page(Article.objects.all(), text), args.repeat)
+        indexed = common.measure(lambda: search_page(Article.objects.all(), text), args.repeat)
+        print(f"{text:<16} {matches:>9} {naive * 1000:>10.2f} {indexed * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
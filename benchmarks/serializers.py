@@ -0,0 +1,43 @@
+"""
+Rows per second of the marshmallow schemas versus the compiled serializers,
+including the queries needed to load each page.
+
+    python -m benchmarks.serializers --articles 20000 --page 1000
+"""
+import argparse
+
+from benchmarks import common, dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    common.setup()
+    from django_article.articles.models import Article
+    from django_article.articles.schemas import ArticleSchema, article_serializer
+    from django_article.authors.models import Author
+    from django_article.authors.schemas import AuthorSchema, author_serializer
+    from django_article.regions.models import Region
+    from django_article.regions.schemas import RegionSchema, region_serializer
+
+    dataset.generate(args.articles, regions=200, authors=args.page, regions_per_article=3)
+    cases = (
+        ("article", Article.objects.with_relations(), ArticleSchema, article_serializer),
+        ("author", Author.objects.all(), AuthorSchema, author_serializer),
+        ("region", Region.objects.all(), RegionSchema, region_serializer),
+    )
+    print(f"{'schema':>8} {'marshmallow':>14} {'compiled':>14} {'speedup':>8}  (rows/s)")
+    for name, queryset, schema_cls, serializer in cases:
+        page = queryset.order_by("pk")[:args.page]
+        rows = len(serializer.dump(page))
+        before = rows / common.measure(lambda: schema_cls(many=True).dump(page.all()), args.repeat)
+        after = rows / common.measure(lambda: serializer.dump(page.all()), args.repeat)
+        print(f"{name:>8} {before:>14,.0f} {after:>14,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
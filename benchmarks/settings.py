@@ -0,0 +1,18 @@
+"""Settings for servers started by the load benchmarks."""
+import os
+
+from django_article.settings import *  # noqa: F401,F403
+from django_article.settings import DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+DATABASES = dict(DATABASES, default=dict(DATABASES["default"], NAME=os.environ["BENCHMARK_DB"]))
+# Measure the views themselves, not the response cache
+RESPONSE_CACHE_ENABLED = False
+
+# The load benchmark's baseline: SQLite's defaults (rollback journal, full
+# fsync on commit) and a new connection per request
+if os.environ.get("BENCHMARK_SQLITE") == "untuned":
+    SQLITE_PRAGMAS = {"journal_mode": "delete"}
+    for database in DATABASES.values():
+        database.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
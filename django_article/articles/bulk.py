@@ -0,0 +1,148 @@
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from marshmallow import ValidationError
+
+from django_article.articles.models import Article
+from django_article.articles.schemas import ArticleBulkSchema
+from django_article.authors.models import Author
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+from django_article.response_cache import response_cache
+from django_article.stats.counters import Changes
+
+
+def parse_documents(body, ndjson=False):
+    """
+    Decodes a JSON array, or one JSON document per line for NDJSON. Lines that
+    are not valid JSON are returned as ValidationErrors so they can be
+    reported per item. Raises ValueError if the body can not be used at all.
+    """
+    if not ndjson:
+        documents = json.loads(body)
+        if not isinstance(documents, list):
+            raise ValueError("Expected a JSON array")
+        return documents
+    documents = []
+    for line in body.decode().splitlines():
+        if not line.strip():
+            continue
+        try:
+            documents.append(json.loads(line))
+        except ValueError:
+            documents.append(ValidationError({"_schema": ["Invalid JSON."]}))
+    return documents
+
+
+def bulk_save(documents):
+    """
+    Validates every document up front, resolves authors and existing articles with
+    one query each (regions come from the in-process snapshot), then writes all valid items inside a single
+    transaction using bulk_create/bulk_update and one batched insert into the
+    regions through table. The stats counters are updated once for the batch,
+    as none of this sends signals. Returns one result per document, in order; invalid
+    documents carry their errors and do not abort the valid ones.
+    """
+    results = [None] * len(documents)
+    loaded = {}
+    seen_ids = set()
+    schema = ArticleBulkSchema()
+    for index, document in enumerate(documents):
+        try:
+            if isinstance(document, ValidationError):
+                raise document
+            data = schema.load(document)
+            if data.get("id") is not None:
+                if data["id"] in seen_ids:
+                    raise ValidationError({"id": ["Duplicate article id in batch"]})
+                seen_ids.add(data["id"])
+        except ValidationError as e:
+            results[index] = {"status": "error", "errors": e.messages}
+            continue
+        loaded[index] = data
+
+    region_refs = [region for data in loaded.values() for region in data.get("regions") or ()]
+    authors = Author.objects.in_bulk({data["author"] for data in loaded.values() if data.get("author") is not None})
+    snapshot = region_lookup.covering(
+        ids=[region["id"] for region in region_refs if "id" in region],
+        codes=[region["code"] for region in region_refs if "id" not in region],
+    )
+    regions_by_id = {
+        region["id"]: snapshot.by_id[region["id"]] for region in region_refs
+        if "id" in region and region["id"] in snapshot.by_id
+    }
+    articles = Article.objects.in_bulk(seen_ids)
+
+    now = timezone.now()
+    changes = Changes()
+    new_regions = {}
+    to_create, to_update, region_sets = [], [], []
+    for index, data in list(loaded.items()):
+        errors = {}
+        if data.get("author") is not None and data["author"] not in authors:
+            errors["author"] = ["Author does not exists"]
+        if any("id" in region and region["id"] not in regions_by_id for region in data.get("regions") or ()):
+            errors["regions"] = ["Region does not exists"]
+        if errors:
+            results[index] = {"status": "error", "errors": errors}
+            del loaded[index]
+            continue
+
+        regions = data.pop("regions", None)
+        if "author" in data:
+            data["author"] = authors.get(data["author"])
+        article = articles.get(data.get("id"))
+        if article is None:
+            article = Article(**data)
+            to_create.append(article)
+            changes.articles += 1
+            changes.move_author(None, article.author_id)
+        else:
+            counted_author_id = article.author_id
+            for field, value in data.items():
+                setattr(article, field, value)
+            changes.move_author(counted_author_id, article.author_id)
+            article.version += 1
+            article.updated_at = now
+            to_update.append(article)
+        loaded[index] = article
+
+        if isinstance(regions, list):
+            region_sets.append((article, [
+                regions_by_id[region["id"]] if "id" in region
+                else snapshot.by_code.get(region["code"])
+                or new_regions.setdefault(region["code"], Region(code=region["code"], name=region["name"]))
+                for region in regions
+            ]))
+
+    through = Article.regions.through
+    updated_ids = {article.id for article in to_update}
+    with transaction.atomic():
+        if new_regions:
+            Region.objects.bulk_create(new_regions.values())
+            region_lookup.invalidate_on_commit()
+            response_cache.bump_on_commit(Region)
+        Article.objects.bulk_create(to_create)
+        Article.objects.bulk_update(to_update, ["title", "content", "author", "version", "updated_at"])
+        old_links = through.objects.filter(
+            article_id__in=[article.id for article, _ in region_sets if article.id in updated_ids]
+        )
+        changes.link(old_links.values_list("region_id", flat=True), -1)
+        old_links.delete()
+        new_links = [
+            through(article_id=article.id, region_id=region_id)
+            for article, regions in region_sets
+            for region_id in {region.id for region in regions}
+        ]
+        through.objects.bulk_create(new_links)
+        # bulk_create/bulk_update send no model signals
+        changes.regions_total += len(new_regions)
+        changes.link([link.region_id for link in new_links], 1)
+        changes.apply()
+        if to_create or to_update:
+            response_cache.bump_on_commit(Article)
+
+    for index, article in loaded.items():
+        results[index] = {"id": article.id, "status": "updated" if article.id in updated_ids else "created"}
+    return results
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# External-content FTS5 index over articles_article(title, content). Only the
+# index is stored; the triggers keep it in step with every write, including
+# bulk_create/bulk_update and raw SQL. Migrations that make Django rebuild the
+# articles table on SQLite drop the triggers with the old table, and must
+# create them again.
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE articles_article_fts USING fts5(
+        title, content, content='articles_article', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Titles weigh ten times as much as content in the table's `rank`
+    "INSERT INTO articles_article_fts(articles_article_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER articles_article_fts_insert AFTER INSERT ON articles_article BEGIN
+        INSERT INTO articles_article_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER articles_article_fts_delete AFTER DELETE ON articles_article BEGIN
+        INSERT INTO articles_article_fts(articles_article_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER articles_article_fts_update AFTER UPDATE OF title, content ON articles_article BEGIN
+        INSERT INTO articles_article_fts(articles_article_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO articles_article_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO articles_article_fts(articles_article_fts) VALUES ('rebuild')",
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER IF EXISTS articles_article_fts_insert",
+    "DROP TRIGGER IF EXISTS articles_article_fts_delete",
+    "DROP TRIGGER IF EXISTS articles_article_fts_update",
+    "DROP TABLE IF EXISTS articles_article_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_article_updated_at_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_INDEX), run(DROP_INDEX)),
+    ]
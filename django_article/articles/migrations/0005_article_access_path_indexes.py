@@ -0,0 +1,45 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The foreign key's own index is dropped in SQL rather than through
+# AlterField(db_index=False), which SQLite implements by rebuilding the
+# table (and losing the search triggers of 0004 with it).
+DROP_AUTHOR_INDEX = 'DROP INDEX IF EXISTS "articles_article_author_id_059aea7d"'
+CREATE_AUTHOR_INDEX = 'CREATE INDEX "articles_article_author_id_059aea7d" ON "articles_article" ("author_id")'
+
+# A region's articles: the through table is created by the ManyToManyField,
+# which has no Meta to declare the index on. Unlike the indexes Django knows
+# of, it is not recreated if a later migration rebuilds the table.
+CREATE_REGION_INDEX = (
+    'CREATE INDEX "articles_article_regions_region_id_article_id" '
+    'ON "articles_article_regions" ("region_id", "article_id")'
+)
+DROP_REGION_INDEX = 'DROP INDEX IF EXISTS "articles_article_regions_region_id_article_id"'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authors', '0003_author_author_name_idx'),
+        ('articles', '0004_article_search_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='article',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='articles', to='authors.author'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(DROP_AUTHOR_INDEX, CREATE_AUTHOR_INDEX),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['author', 'id'], name='article_author_id_idx'),
+        ),
+        migrations.RunSQL(CREATE_REGION_INDEX, DROP_REGION_INDEX),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# The foreign key indexes Django gives the through table are prefixes of the
+# (article_id, region_id) unique index and of the (region_id, article_id)
+# index of 0005, which serve the same lookups. Dropped in SQL for the same
+# reasons as the author index of 0005.
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS "articles_article_regions_article_id_062fd80a"',
+    'DROP INDEX IF EXISTS "articles_article_regions_region_id_ca61c477"',
+]
+CREATE_INDEXES = [
+    'CREATE INDEX "articles_article_regions_article_id_062fd80a" ON "articles_article_regions" ("article_id")',
+    'CREATE INDEX "articles_article_regions_region_id_ca61c477" ON "articles_article_regions" ("region_id")',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0005_article_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_INDEXES, CREATE_INDEXES),
+    ]
@@ -1,12 +1,150 @@
+import re
+
 from django.db import models
+from django.db.models import Exists, F, IntegerField, OuterRef
+from django.db.models.expressions import RawSQL
+
+from django_article.conditional import make_etag
+from django_article.models import VersionedModel, VersionedQuerySet
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+
+
+SEARCH_TABLE = "articles_article_fts"
+# Annotated by related_versions() for each relation, in this order
+RELATED_VERSIONS = {"author": ("author_version",), "regions": ("regions_linked", "regions_version")}
+
+
+def search_expression(text):
+    """
+    Quotes every word of `text` as an FTS5 string, so user input is never
+    parsed as query syntax. A trailing `*` keeps prefix matching.
+    """
+    return " ".join(f'"{term}"{prefix}' for term, prefix in re.findall(r"(\w+)(\*?)", text))
+
+
+def ordered_regions():
+    return models.Prefetch("regions", queryset=Region.objects.order_by("id"))
+
+
+def related_versions(relations=tuple(RELATED_VERSIONS), article=None, prefix=""):
+    """
+    Annotations of what else an article's representation depends on, for
+    the embedded `relations`: the version of its author, and the number and
+    version sum of its regions. `article` is the column holding the
+    article's id (its own by default) and `prefix` reaches its fields.
+    Versions only grow, and a region is only linked through a write that
+    moves the article's own version, so these change whenever the author or
+    a region is updated or deleted. That spares rewriting every article of
+    a region or author when one is saved.
+    """
+    annotations = {}
+    if "author" in relations:
+        annotations["author_version"] = F(f"{prefix}author__version")
+    if "regions" in relations:
+        # Written as SQL: built from querysets, the two subqueries take the
+        # ORM far longer than SQLite takes to run them, on every detail GET
+        article = article or f"{Article._meta.db_table}.id"
+        links = f"{Article.regions.through._meta.db_table} links WHERE links.article_id = {article}"
+        annotations["regions_linked"] = RawSQL(f"SELECT COUNT(*) FROM {links}", (), IntegerField())
+        annotations["regions_version"] = RawSQL(
+            f"SELECT SUM(version) FROM {Region._meta.db_table} WHERE id IN (SELECT region_id FROM {links})",
+            (),
+            IntegerField(),
+        )
+    return annotations
+
+
+def related_version_names(relations=tuple(RELATED_VERSIONS)):
+    return tuple(name for relation in relations for name in RELATED_VERSIONS[relation])
 
 
-class Article(models.Model):
+class ArticleQuerySet(VersionedQuerySet):
+    def with_related_versions(self, relations=tuple(RELATED_VERSIONS)):
+        return self.annotate(**related_versions(relations))
+
+    def validators(self, relations=tuple(RELATED_VERSIONS)):
+        # Only the embedded relations can change a page
+        queryset = self.with_related_versions(relations)
+        return queryset.values_list("id", "version", *related_version_names(relations))
+
+    def with_relations(self):
+        # Everything ArticleSchema.dump touches, loaded in a fixed number of
+        # queries: the author is joined and all regions come in one extra query.
+        return self.select_related("author").prefetch_related(ordered_regions())
+
+    def filter_regions(self, codes, match="all", snapshot=None):
+        # Codes are resolved from the in-process snapshot, so only the through
+        # table is queried. Async callers pass one from region_lookup.acovering().
+        codes = set(codes)
+        snapshot = snapshot or region_lookup.covering(codes=codes)
+        region_ids = sorted(region_lookup.ids_for_codes(codes, snapshot))
+        if match == "all":
+            if len(region_ids) < len(codes):
+                return self.none()
+            # SQLite drives this from the first region's through rows and probes
+            # the (article_id, region_id) unique index for the others, which
+            # stays flat as codes are added. A GROUP BY/HAVING COUNT over
+            # every matching link grows with the number of codes instead.
+            queryset = self
+            for region_id in region_ids:
+                queryset = queryset.filter(regions=region_id)
+            return queryset
+        if not region_ids:
+            return self if match == "none" else self.none()
+        # One correlated EXISTS probe per article, stopping at the page limit
+        tagged = Exists(
+            self.model.regions.through.objects.filter(article_id=OuterRef("pk"), region_id__in=region_ids)
+        )
+        return self.filter(~tagged if match == "none" else tagged)
+
+    def search(self, text):
+        # Joins the FTS5 index from migration 0004. `rank` is its bm25 score
+        # (lower is better) and `snippet` the best matching fragment.
+        expression = search_expression(text)
+        queryset = self.extra(
+            select={
+                "rank": f"{SEARCH_TABLE}.rank",
+                "snippet": f"snippet({SEARCH_TABLE}, -1, '<mark>', '</mark>', '…', 16)",
+            },
+            tables=[SEARCH_TABLE],
+            where=[f"{SEARCH_TABLE} MATCH %s", f"{SEARCH_TABLE}.rowid = articles_article.id"],
+            params=[expression],
+        )
+        return queryset if expression else queryset.none()
+
+    def ranked_after(self, rank, after):
+        # Keyset position of a search page, ordered by (rank, id)
+        return self.extra(
+            where=[f"({SEARCH_TABLE}.rank > %s OR ({SEARCH_TABLE}.rank = %s AND articles_article.id > %s))"],
+            params=[rank, rank, after],
+        )
+
+
+REGION_MATCH_MODES = ("any", "all", "none")
+
+
+class Article(VersionedModel):
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True)
     regions = models.ManyToManyField(
         'regions.Region', related_name='articles', blank=True
     )
     author = models.ForeignKey(
-        'authors.Author', related_name='articles', on_delete=models.SET_NULL, null=True,
+        'authors.Author', related_name='articles', on_delete=models.SET_NULL, null=True, db_index=False,
     )
+
+    objects = ArticleQuerySet.as_manager()
+
+    class Meta(object):
+        indexes = [
+            # An author's articles in id order, for keyset pages. Replaces the
+            # plain foreign key index, which it covers.
+            models.Index(fields=["author", "id"], name="article_author_id_idx"),
+        ]
+
+    @property
+    def etag(self):
+        # Of an article loaded with_related_versions()
+        related = (getattr(self, name) for name in related_version_names())
+        return make_etag(self._meta.label, self.pk, self.version, *related)
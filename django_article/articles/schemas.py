@@ -1,19 +1,25 @@
+from collections import defaultdict
+
+from django.db.models import Q
 from marshmallow import validate, ValidationError
 from marshmallow import fields
-from marshmallow import Schema
 from marshmallow.decorators import post_load
 
 from django_article.articles.models import Article
 from django_article.authors.models import Author
-from django_article.authors.schemas import AuthorSchema
+from django_article.authors.schemas import AuthorSchema, author_serializer
+from django_article.regions.lookup import region_lookup
 from django_article.regions.models import Region
 from django_article.regions.schemas import RegionSchema
-from django_article.utils import must_not_be_blank
+from django_article.instrumentation import timed
+from django_article.serializers import CompiledSerializer, Schema
+from django_article.utils import must_fit_sqlite_integer, must_not_be_blank
 
 
 class ArticleSchema(Schema):
     class Meta(object):
         model = Article
+        ordered = True
 
     id = fields.Integer()
     title = fields.String(validate=[validate.Length(max=255), must_not_be_blank], required=True, allow_blank=False)
@@ -29,10 +35,30 @@ class ArticleSchema(Schema):
         return RegionSchema().dump(article.regions.all(), many=True)
 
     def load_regions(self, regions):
-        return [
-            Region.objects.get_or_create(id=region.pop("id", None), defaults=region)[0]
-            for region in regions
+        # Known regions come from the in-process snapshot without a query,
+        # the others are looked up together and created if missing
+        refs = [(region.pop("id", None), region) for region in regions]
+        resolved = [
+            region_lookup.get(region_id) if region_id is not None else region_lookup.get_by_code(region.get("code"))
+            for region_id, region in refs
         ]
+        missing = [ref for ref, known in zip(refs, resolved) if known is None]
+        if not missing:
+            return resolved
+        found = Region.objects.filter(
+            Q(id__in=[region_id for region_id, _ in missing if region_id is not None])
+            | Q(code__in=[region.get("code") for region_id, region in missing if region_id is None])
+        )
+        by_id = {region.id: region for region in found}
+        by_code = {region.code: region for region in by_id.values()}
+        for index, (region_id, region) in enumerate(refs):
+            if resolved[index] is None:
+                known = by_id.get(region_id) if region_id is not None else by_code.get(region.get("code"))
+                if known is None:
+                    known = Region.objects.create(id=region_id, **region)
+                    by_id[known.id] = by_code[known.code] = known
+                resolved[index] = known
+        return resolved
 
     def get_author(self, article):
         return AuthorSchema().dump(article.author)
@@ -40,18 +66,138 @@ class ArticleSchema(Schema):
     def query_author(self, author):
         if type(author) != dict or "id" not in author:
             return None
-        qr = Author.objects.filter(id=author.get("id"))
-        if qr.exists():
-            return qr.first()
-        else:
+        found = Author.objects.filter(id=author.get("id")).first()
+        if found is None:
             raise ValidationError("Author does not exists")
+        return found
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
+        # The view passes the article it loaded as the "instance" context,
+        # and learns from "written" whether anything changed
         regions = data.pop("regions", None)
-        article, _ = Article.objects.update_or_create(
-            id=data.pop("id", None), defaults=data
+        article, created = Article.objects.update_or_create_by_id(
+            data.pop("id", None), data, self.context.get("instance")
         )
-        if isinstance(regions, list):
-            article.regions.set(regions)
+        regions_changed = isinstance(regions, list) and self.update_regions(article, regions, created)
+        if regions_changed and not created and not article.changed_fields:
+            # Moves the version, and with it the ETag
+            article.save(update_fields=())
+        self.context["written"] = created or bool(article.changed_fields) or regions_changed
         return article
+
+    def update_regions(self, article, regions, created):
+        """Links the article to exactly `regions`; returns whether any link changed."""
+        if created:
+            # Nothing to diff against
+            article.regions.add(*regions)
+            return bool(regions)
+        through = Article.regions.through
+        current = set(through.objects.filter(article_id=article.pk).values_list("region_id", flat=True))
+        wanted = {region.pk for region in regions}
+        if current == wanted:
+            return False
+        article.regions.remove(*(current - wanted))
+        article.regions.add(*(region for region in regions if region.pk not in current))
+        return True
+
+
+class ArticleBulkSchema(ArticleSchema):
+    """
+    Validation-only variant of ArticleSchema for the bulk endpoint: nothing is
+    queried or written while loading, related objects are left as references
+    for `bulk_save` to resolve in batches.
+    """
+    id = fields.Integer(validate=must_fit_sqlite_integer)
+
+    def load_regions(self, regions):
+        if not isinstance(regions, list):
+            raise ValidationError("Not a valid list.")
+        loaded = []
+        for region in regions:
+            if isinstance(region, dict) and "id" in region:
+                if type(region["id"]) != int:
+                    raise ValidationError("Region id must be an integer")
+                must_fit_sqlite_integer(region["id"])
+                loaded.append({"id": region["id"]})
+                continue
+            errors = RegionSchema().validate(region if isinstance(region, dict) else {})
+            if errors:
+                raise ValidationError(errors)
+            loaded.append({"code": region["code"], "name": region["name"]})
+        return loaded
+
+    def query_author(self, author):
+        if type(author) != dict or "id" not in author:
+            return None
+        if type(author["id"]) != int:
+            raise ValidationError("Author id must be an integer")
+        must_fit_sqlite_integer(author["id"])
+        return author["id"]
+
+    @post_load
+    def update_or_create(self, data, *args, **kwargs):
+        return data
+
+
+class ArticleSerializer(CompiledSerializer):
+    def __init__(self, only=None):
+        super(ArticleSerializer, self).__init__(ArticleSchema, relations=("regions", "author"), only=only)
+        # Relations outside the fieldset are neither joined nor queried
+        self.with_regions = only is None or "regions" in only
+        self.with_author = only is None or "author" in only
+        self.id_index = self.columns.index("id")
+        if self.with_author:
+            self.author_index = len(self.columns)
+            self.author_id_index = self.author_index + author_serializer.columns.index("id")
+            self.columns += tuple(f"author__{column}" for column in author_serializer.columns)
+
+    def compile_subset(self, only):
+        return ArticleSerializer(only)
+
+    def dump_rows(self, rows):
+        rows = list(rows)
+        regions = defaultdict(list)
+        if self.with_regions:
+            links = list(self.links(rows))
+            self.add_regions(regions, links, region_lookup.dump_many({region_id for _, region_id in links}))
+        return self.dump_with_regions(rows, regions)
+
+    async def adump_rows(self, rows):
+        regions = defaultdict(list)
+        if self.with_regions:
+            links = [link async for link in self.links(rows)]
+            self.add_regions(regions, links, await region_lookup.adump_many({region_id for _, region_id in links}))
+        return self.dump_with_regions(rows, regions)
+
+    def add_regions(self, regions, links, dumped):
+        for article_id, region_id in links:
+            if region_id in dumped:
+                regions[article_id].append(dumped[region_id])
+
+    def links(self, rows):
+        # Same ordering as Article.objects.with_relations(); the regions
+        # themselves come from the in-process snapshot.
+        links = Article.regions.through.objects.filter(article_id__in=[row[self.id_index] for row in rows])
+        return links.order_by("region_id").values_list("article_id", "region_id")
+
+    def dump_with_regions(self, rows, regions):
+        with timed("serialize"):
+            return self._dump_with_regions(rows, regions)
+
+    def _dump_with_regions(self, rows, regions):
+        id_index, dump_row = self.id_index, self.dump_row
+        if not self.with_author:
+            return [dump_row(row, regions[row[id_index]], None) for row in rows]
+        author_index, author_id_index, dump_author = self.author_index, self.author_id_index, author_serializer.dump_row
+        return [
+            dump_row(
+                row,
+                regions[row[id_index]],
+                dump_author(row[author_index:]) if row[author_id_index] is not None else {},
+            )
+            for row in rows
+        ]
+
+
+article_serializer = ArticleSerializer()
@@ -0,0 +1,34 @@
+from django_article.articles.models import Article
+from django_article.conditional import add_validators, not_modified, page_etag
+from django_article.utils import PaginationError, build_page, json_response, parse_page
+
+
+async def search_response(request, queryset, serializer, text):
+    """
+    Full-text search over `queryset`, best matches first. Items are the
+    dumped articles plus their `rank` and `snippet`, paginated by a keyset on
+    `(rank, id)`. Ranks depend on the whole corpus, so a page fetched after
+    other articles changed may overlap the previous one slightly.
+    """
+    try:
+        limit, after = parse_page(request, ranked=True)
+    except PaginationError as e:
+        return json_response({"error": str(e)}, 400)
+    page_qs = queryset.search(text)
+    if after is not None:
+        page_qs = page_qs.ranked_after(*after)
+    rows = [row async for row in page_qs.order_by("rank", "pk").values_list("id", "rank", "snippet")[:limit + 1]]
+    # Looked up for the page alone: every match is ranked before the limit
+    # applies, and would cost the related versions' subqueries otherwise
+    page_qs = serializer.validators(Article.objects.filter(pk__in=[row[0] for row in rows]))
+    validators = {row[0]: row async for row in page_qs}
+    key = (text, [row[1] for row in rows], *serializer.etag_key)
+    etag = page_etag(Article, limit, [validators.get(row[0]) for row in rows], key=key)
+    response = not_modified(request, etag, None)
+    if response is None:
+        page_articles = Article.objects.filter(pk__in=[row[0] for row in rows])
+        dumped = {item["id"]: item for item in await serializer.adump(page_articles)}
+        items = [dict(dumped[row[0]], rank=row[1], snippet=row[2]) for row in rows]
+        page = build_page(request, items, limit, ranked=True)
+        response = add_validators(json_response(page.items, headers=page.headers), etag, None)
+    return response
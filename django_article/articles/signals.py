@@ -0,0 +1,16 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from django_article.articles.models import Article
+from django_article.response_cache import response_cache
+
+
+@receiver([post_save, post_delete], sender=Article)
+def bump_article_generation(sender, **kwargs):
+    response_cache.bump_on_commit(Article)
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def bump_article_generation_for_regions(sender, action, **kwargs):
+    if action.startswith("post_"):
+        response_cache.bump_on_commit(Article)
@@ -1,9 +1,25 @@
+import gzip
 import json
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import time
+import warnings
+from unittest import skipUnless
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
+from django_article import middleware
 from django_article.articles.models import Article
+from django_article.articles.schemas import ArticleSchema, article_serializer
 from django_article.authors.models import Author
+from django_article.regions.lookup import region_lookup
 from django_article.regions.models import Region
+from django_article.response_cache import response_cache
+from django_article.utils import encode_cursor
 
 
 class ArticleListViewTestCase(TestCase):
@@ -161,6 +177,856 @@ class ArticleListViewTestCase(TestCase):
         })
 
 
+class ArticleListRegionFilterTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.al = Region.objects.create(code="AL", name="Albania")
+        self.uk = Region.objects.create(code="UK", name="United Kingdom")
+        self.us = Region.objects.create(code="US", name="United States of America")
+        self.article_none = Article.objects.create(title="No regions")
+        self.article_al = Article.objects.create(title="Albania")
+        self.article_al.regions.set([self.al])
+        self.article_al_uk = Article.objects.create(title="Albania and UK")
+        self.article_al_uk.regions.set([self.al, self.uk])
+        self.article_all = Article.objects.create(title="Everywhere")
+        self.article_all.regions.set([self.al, self.uk, self.us])
+
+    def get_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [article["id"] for article in response.json()]
+
+    def test_defaults_to_all_codes(self):
+        self.assertEqual(
+            self.get_ids(region_code="AL,UK"), [self.article_al_uk.id, self.article_all.id]
+        )
+        self.assertEqual(self.get_ids(region_code="AL,UK,US,AL"), [self.article_all.id])
+
+    def test_matches_any_code(self):
+        self.assertEqual(
+            self.get_ids(region_code="UK,US", region_match="any"),
+            [self.article_al_uk.id, self.article_all.id],
+        )
+
+    def test_matches_none_of_the_codes(self):
+        self.assertEqual(
+            self.get_ids(region_code="UK,US", region_match="none"),
+            [self.article_none.id, self.article_al.id],
+        )
+
+    def test_unknown_code_matches_nothing_for_all(self):
+        self.assertEqual(self.get_ids(region_code="AL,ZZ"), [])
+        self.assertEqual(self.get_ids(region_code="AL,ZZ", region_match="any"), [
+            self.article_al.id, self.article_al_uk.id, self.article_all.id
+        ])
+
+    def test_rejects_unknown_match_mode(self):
+        response = self.client.get(self.url, {"region_code": "AL", "region_match": "some"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filter_query_count(self):
+        region_lookup.snapshot()
+        # Whether the codes the snapshot lacks exist elsewhere, validators with
+        # the filter, then the page rows and region links by id
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {"region_code": "AL,UK,US,AU,TR,PL", "region_match": "any"})
+
+
+class ArticleListPaginationTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.articles = [Article.objects.create(title=f"Article {i}") for i in range(5)]
+
+    def test_pages_through_all_articles_with_cursor(self):
+        response = self.client.get(self.url, {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a["id"] for a in response.json()], [a.id for a in self.articles[:2]])
+        self.assertIn('rel="next"', response["Link"])
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(self.url, params)
+            seen.extend(a["id"] for a in response.json())
+            cursor = response.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        self.assertEqual(seen, [a.id for a in self.articles])
+
+    def test_last_page_has_no_next_cursor(self):
+        response = self.client.get(self.url, {"limit": 5})
+        self.assertEqual(len(response.json()), 5)
+        self.assertFalse(response.has_header("X-Next-Cursor"))
+        self.assertFalse(response.has_header("Link"))
+
+    def test_cursor_combines_with_region_filter(self):
+        region = Region.objects.create(code="AL", name="Albania")
+        for article in self.articles[1:]:
+            article.regions.set([region])
+        response = self.client.get(self.url, {"region_code": "AL", "limit": 3})
+        self.assertEqual([a["id"] for a in response.json()], [a.id for a in self.articles[1:4]])
+        response = self.client.get(
+            self.url, {"region_code": "AL", "limit": 3, "cursor": response["X-Next-Cursor"]}
+        )
+        self.assertEqual([a["id"] for a in response.json()], [self.articles[4].id])
+
+    def test_rejects_invalid_limit_and_cursor(self):
+        for params in ({"limit": "abc"}, {"limit": 0}, {"limit": 100000}, {"cursor": "not-a-cursor"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.json())
+
+    def test_rejects_cursor_ids_out_of_range(self):
+        for last_id in (10 ** 30, 2 ** 63, -1):
+            response = self.client.get(self.url, {"cursor": encode_cursor(last_id)})
+            self.assertEqual(response.status_code, 400, last_id)
+            self.assertEqual(response.json(), {"error": "Invalid cursor"})
+        response = self.client.get(self.url, {"q": "Article", "cursor": encode_cursor(1, rank=-10 ** 30)})
+        self.assertEqual(response.status_code, 400)
+
+
+class ArticleNestedListTestCase(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.articles = [Article.objects.create(title=f"Article {i}", author=self.author if i % 2 else None) for i in range(7)]
+        for article in self.articles[2:]:
+            article.regions.set([self.region])
+        region_lookup.invalidate()
+
+    def page_through(self, url, limit=2):
+        seen, params = [], {"limit": limit}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.json())
+            if not response.has_header("X-Next-Cursor"):
+                return seen
+            params["cursor"] = response["X-Next-Cursor"]
+
+    def test_author_articles(self):
+        articles = self.page_through(reverse("author-articles", args=(self.author.id,)))
+        self.assertEqual([a["id"] for a in articles], [a.id for a in self.articles[1::2]])
+        self.assertTrue(all(a["author"]["id"] == self.author.id for a in articles))
+        self.assertEqual(articles[-1]["regions"], [{"id": self.region.id, "code": "AL", "name": "Albania"}])
+
+    def test_region_articles(self):
+        articles = self.page_through(reverse("region-articles", args=(self.region.id,)))
+        self.assertEqual([a["id"] for a in articles], [a.id for a in self.articles[2:]])
+        self.assertEqual(articles[1]["author"]["id"], self.author.id)
+
+    def test_fieldsets(self):
+        response = self.client.get(reverse("region-articles", args=(self.region.id,)), {"fields": "title"})
+        self.assertEqual(response.json()[0], {"id": self.articles[2].id, "title": "Article 2"})
+
+    def test_unknown_author_or_region_is_404(self):
+        self.assertEqual(self.client.get(reverse("author-articles", args=(999,))).status_code, 404)
+        self.assertEqual(self.client.get(reverse("region-articles", args=(999,))).status_code, 404)
+
+    def test_query_count_does_not_grow_with_articles(self):
+        region_lookup.snapshot()
+        # The validators, the rows joined with their author, the region links;
+        # the author's existence is checked first
+        with self.assertNumQueries(4):
+            self.client.get(reverse("author-articles", args=(self.author.id,)))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("region-articles", args=(self.region.id,)))
+        self.assertEqual(len(response.json()), 5)
+
+
+class ArticleSearchTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.in_title = Article.objects.create(title="Tirana travel guide", content="Where to eat")
+        self.in_content = Article.objects.create(title="Balkan food", content="Tirana has great food")
+        self.in_content.regions.set([self.region])
+        Article.objects.create(title="Unrelated", content="Nothing to see")
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_ranks_title_matches_first(self):
+        results = self.search(q="tirana").json()
+        self.assertEqual([r["id"] for r in results], [self.in_title.id, self.in_content.id])
+        self.assertLess(results[0]["rank"], results[1]["rank"])
+        self.assertEqual(results[0]["snippet"], "<mark>Tirana</mark> travel guide")
+        self.assertEqual(results[1]["regions"], [{"id": self.region.id, "code": "AL", "name": "Albania"}])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(len(self.search(q='"tirana').json()), 2)
+        self.assertEqual(self.search(q="tirana OR unrelated").json(), [])
+        self.assertEqual(len(self.search(q="tira*").json()), 2)
+        self.assertEqual(self.search(q="!!!").json(), [])
+
+    def test_index_follows_writes(self):
+        self.client.put(
+            reverse("article", kwargs={"article_id": self.in_title.id}),
+            data=json.dumps({"title": "Durres travel guide"}),
+            content_type="application/json",
+        )
+        self.in_content.delete()
+        self.assertEqual(self.search(q="tirana").json(), [])
+        self.assertEqual([r["id"] for r in self.search(q="durres").json()], [self.in_title.id])
+
+    def test_combines_with_region_filter(self):
+        results = self.search(q="tirana", region_code="AL").json()
+        self.assertEqual([r["id"] for r in results], [self.in_content.id])
+
+    def test_cursor_pagination(self):
+        first = self.search(q="tirana", limit=1)
+        second = self.search(q="tirana", limit=1, cursor=first["X-Next-Cursor"])
+        self.assertEqual([r["id"] for r in first.json() + second.json()], [self.in_title.id, self.in_content.id])
+        self.assertFalse(second.has_header("X-Next-Cursor"))
+        response = self.client.get(self.url, {"q": "tirana", "cursor": encode_cursor(self.in_title.id)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"q": "tirana", "stream": "true"}).status_code, 400)
+
+
+@override_settings(STREAMING_CHUNK_SIZE=2)
+class ArticleListStreamingTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        region = Region.objects.create(code="AL", name="Albania")
+        author = Author.objects.create(first_name="Henry", last_name="Benington")
+        for i in range(5):
+            article = Article.objects.create(title=f"Article {i}", author=author if i % 2 else None)
+            article.regions.set([region])
+
+    async def read(self, response):
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    async def test_streams_all_articles_as_json_array(self):
+        expected = (await self.async_client.get(self.url)).json()
+        response = await self.async_client.get(self.url, {"stream": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(await self.read(response)), expected)
+
+    def test_streams_prefetched_batches(self):
+        async def stream():
+            return await self.read(await self.async_client.get(self.url, {"stream": "1"}))
+
+        # One query for the rows plus one region links query per batch of two
+        region_lookup.snapshot()
+        with self.assertNumQueries(4):
+            content = async_to_sync(stream)()
+        self.assertEqual(len(json.loads(content)), 5)
+
+    def test_streams_lazily_under_wsgi(self):
+        response = self.client.get(self.url, {"stream": "true"})
+        self.assertFalse(response.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            chunks = iter(response.streaming_content)
+            self.assertEqual(next(chunks), b"[")
+            content = b"[" + b"".join(chunks)
+        self.assertEqual(json.loads(content), self.client.get(self.url).json())
+
+    async def test_streams_empty_array(self):
+        await Article.objects.all().adelete()
+        response = await self.async_client.get(self.url, {"stream": "true"})
+        self.assertEqual(await self.read(response), b"[]")
+
+
+class ArticleQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.regions = [
+            Region.objects.create(code="AL", name="Albania"),
+            Region.objects.create(code="UK", name="United Kingdom"),
+        ]
+
+    def create_articles(self, count):
+        for i in range(count):
+            author = Author.objects.create(first_name=f"First {i}", last_name=f"Last {i}")
+            article = Article.objects.create(title=f"Article {i}", author=author)
+            article.regions.set(self.regions)
+
+    def test_list_query_count_does_not_grow_with_articles(self):
+        self.create_articles(1)
+        region_lookup.snapshot()
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        self.create_articles(20)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 21)
+        self.assertTrue(all(len(a["regions"]) == 2 and a["author"] for a in response.json()))
+
+    def test_filtered_list_query_count_does_not_grow_with_articles(self):
+        self.create_articles(20)
+        region_lookup.snapshot()
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"region_code": "AL,UK"})
+        self.assertEqual(len(response.json()), 20)
+
+    def test_detail_query_count(self):
+        self.create_articles(1)
+        article = Article.objects.get()
+        region_lookup.snapshot()
+        # The article, then its row joined with the author, then its region links
+        with self.assertNumQueries(3):
+            self.client.get(reverse("article", kwargs={"article_id": article.id}))
+
+    def test_write_query_counts(self):
+        self.create_articles(1)
+        article, author = Article.objects.get(), Author.objects.get()
+        region_lookup.snapshot()
+        payload = {"title": "Dogs", "author": {"id": author.id}, "regions": [{"id": self.regions[0].id}]}
+        # The author; the article and its region links; the counters of
+        # the totals, the region and the author; the dumped regions. The
+        # transaction is a savepoint inside the test's, hence two more.
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        # The article and the author; the update of the title alone; the
+        # links, diffed and one removed; the counters and the dumped regions
+        with self.assertNumQueries(12):
+            response = self.client.put(
+                reverse("article", kwargs={"article_id": article.id}), json.dumps(payload), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(article.regions.all()), self.regions[:1])
+
+    def test_failed_write_leaves_nothing_behind(self):
+        payload = {"title": "Dogs", "author": {"id": 999}, "regions": [{"code": "PL", "name": "Poland"}]}
+        response = self.client.post(self.url, json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Region.objects.filter(code="PL").exists())
+
+
+class ArticleSerializerTestCase(TestCase):
+    def setUp(self):
+        al = Region.objects.create(code="AL", name="Albania")
+        uk = Region.objects.create(code="UK", name="United Kingdom")
+        author = Author.objects.create(first_name="Henry", last_name="Benington")
+        Article.objects.create(title="No relations")
+        Article.objects.create(title="Author only", content="Lorem Ipsum", author=author)
+        Article.objects.create(title="Üñíçødé \"quoted\"", author=author).regions.set([uk, al])
+        Article.objects.create(title="Regions only").regions.set([al])
+
+    def test_compiled_dump_is_byte_identical_to_schema(self):
+        articles = Article.objects.with_relations().order_by("pk")
+        self.assertEqual(
+            json.dumps(article_serializer.dump(articles)),
+            json.dumps(ArticleSchema(many=True).dump(articles)),
+        )
+
+    def test_compiled_dump_query_count(self):
+        region_lookup.snapshot()
+        with self.assertNumQueries(2):
+            article_serializer.dump(Article.objects.all())
+
+
+class ArticleBulkViewTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-bulk")
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.article = Article.objects.create(title="Existing", content="Old")
+        self.article.regions.set([self.region])
+
+    def post(self, payload, **kwargs):
+        return self.client.post(self.url, data=json.dumps(payload), content_type="application/json", **kwargs)
+
+    def test_creates_and_updates_articles(self):
+        response = self.post([
+            {"title": "New", "author": {"id": self.author.id}, "regions": [{"id": self.region.id}]},
+            {
+                "id": self.article.id,
+                "title": "Existing (Modified)",
+                "regions": [{"code": "UK", "name": "United Kingdom"}, {"code": "AL", "name": "Albania"}],
+            },
+            {"title": "Shares a new region", "regions": [{"code": "UK", "name": "United Kingdom"}]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["status"] for r in results], ["created", "updated", "created"])
+        self.assertEqual(results[1]["id"], self.article.id)
+
+        new_article = Article.objects.get(id=results[0]["id"])
+        self.assertEqual(new_article.author, self.author)
+        self.assertEqual(list(new_article.regions.all()), [self.region])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.title, "Existing (Modified)")
+        self.assertEqual(self.article.content, "Old")
+        self.assertCountEqual(self.article.regions.values_list("code", flat=True), ["AL", "UK"])
+        self.assertEqual(Region.objects.filter(code="UK").count(), 1)
+        self.assertEqual(
+            list(Article.objects.get(id=results[2]["id"]).regions.values_list("code", flat=True)), ["UK"]
+        )
+
+    def test_reports_item_errors_without_aborting_valid_items(self):
+        response = self.post([
+            {"title": ""},
+            {"title": "Valid"},
+            {"title": "Unknown author", "author": {"id": 66666}},
+            {"title": "Unknown region", "regions": [{"id": 66666}]},
+            {"title": "Bad region", "regions": [{"code": "USA", "name": "United States"}]},
+            "not an object",
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["status"] for r in results], ["error", "created", "error", "error", "error", "error"])
+        self.assertIn("title", results[0]["errors"])
+        self.assertEqual(results[2]["errors"], {"author": ["Author does not exists"]})
+        self.assertEqual(results[3]["errors"], {"regions": ["Region does not exists"]})
+        self.assertIn("regions", results[4]["errors"])
+        self.assertEqual(Article.objects.count(), 2)
+
+    def test_rejects_author_ids_that_are_not_integers(self):
+        response = self.post([
+            {"title": "Text id", "author": {"id": "abc"}},
+            {"title": "List id", "author": {"id": [1]}},
+            {"title": "Valid", "author": {"id": self.author.id}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["status"] for r in results], ["error", "error", "created"])
+        self.assertEqual(results[0]["errors"], {"author": ["Author id must be an integer"]})
+        self.assertEqual(results[1]["errors"], {"author": ["Author id must be an integer"]})
+
+    def test_rejects_ids_out_of_sqlite_range(self):
+        response = self.post([
+            {"id": 10 ** 30, "title": "Huge id"},
+            {"title": "Huge author id", "author": {"id": 2 ** 63}},
+            {"title": "Huge region id", "regions": [{"id": -2 ** 63 - 1}]},
+            {"title": "Valid", "author": {"id": self.author.id}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["status"] for r in results], ["error", "error", "error", "created"])
+        self.assertEqual(results[0]["errors"], {"id": ["Id out of range."]})
+        self.assertEqual(results[1]["errors"], {"author": ["Id out of range."]})
+        self.assertEqual(results[2]["errors"], {"regions": ["Id out of range."]})
+
+    def test_accepts_ndjson(self):
+        body = "\n".join([json.dumps({"title": "First"}), "{not json", "", json.dumps({"title": "Second"})])
+        response = self.client.post(self.url, data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.json()], ["created", "error", "created"])
+        self.assertTrue(Article.objects.filter(title="Second").exists())
+
+    def test_rejects_unusable_body(self):
+        self.assertEqual(self.post({"title": "Not an array"}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, data="[", content_type="application/json").status_code, 400)
+        with self.settings(BULK_MAX_ITEMS=1):
+            self.assertEqual(self.post([{"title": "1"}, {"title": "2"}]).status_code, 400)
+
+    def test_query_count_does_not_grow_with_items(self):
+        def payload(count):
+            return [
+                {"title": f"Article {i}", "author": {"id": self.author.id}, "regions": [{"id": self.region.id}]}
+                for i in range(count)
+            ]
+
+        region_lookup.snapshot()
+        # Three of them update the counters of django_article.stats
+        with self.assertNumQueries(8):
+            self.post(payload(2))
+        with self.assertNumQueries(8):
+            self.post(payload(50))
+
+
+class ArticleConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.article = Article.objects.create(title="Fake Article 1", author=self.author)
+        self.article.regions.set([self.region])
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+        self.list_url = reverse("articles-list")
+
+    def test_detail_answers_if_none_match_with_304_in_one_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_ignores_if_modified_since(self):
+        # The article's updated_at does not move with its author or regions
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header("Last-Modified"))
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_the_article_and_its_relations(self):
+        etags = [self.client.get(self.url)["ETag"]]
+        self.client.put(self.url, data=json.dumps({"title": "Modified"}), content_type="application/json")
+        etags.append(self.client.get(self.url)["ETag"])
+        self.region.name = "Republic of Albania"
+        self.region.save()
+        etags.append(self.client.get(self.url)["ETag"])
+        self.author.last_name = "Bennington"
+        self.author.save()
+        etags.append(self.client.get(self.url)["ETag"])
+        self.author.delete()
+        etags.append(self.client.get(self.url)["ETag"])
+        self.assertEqual(len(set(etags)), 5)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_related_writes_move_the_etags_without_writing_articles(self):
+        urls = [
+            self.url, self.list_url, f"{self.list_url}?q=fake", reverse("region-articles", args=(self.region.id,)),
+        ]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+        self.client.put(
+            reverse("region", args=(self.region.id,)),
+            data=json.dumps({"code": "AL", "name": "Republic of Albania"}), content_type="application/json",
+        )
+        self.client.patch(
+            reverse("author", args=(self.author.id,)),
+            data=json.dumps({"last_name": "Bennington"}), content_type="application/json",
+        )
+        self.assertEqual(Article.objects.get().version, 1)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+        # Unless the fieldset leaves the relations out
+        etag = self.client.get(self.list_url, {"fields": "title"})["ETag"]
+        self.region.save()
+        self.assertEqual(self.client.get(self.list_url, {"fields": "title"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_list_answers_if_none_match_with_304_in_one_query(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Article.objects.create(title="Fake Article 2")
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_list_is_stale_after_a_delete(self):
+        older = Article.objects.create(title="Fake Article 0")
+        response = self.client.get(self.list_url)
+        # The newest updated_at of the rows left would not move
+        self.assertFalse(response.has_header("Last-Modified"))
+        older.delete()
+        response = self.client.get(
+            self.list_url, HTTP_IF_NONE_MATCH=response["ETag"], HTTP_IF_MODIFIED_SINCE=http_date(time.time())
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_depends_on_the_page(self):
+        Article.objects.create(title="Fake Article 2")
+        self.assertNotEqual(
+            self.client.get(self.list_url, {"limit": 1})["ETag"], self.client.get(self.list_url)["ETag"]
+        )
+
+    def test_bulk_update_moves_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.post(
+            reverse("articles-bulk"),
+            data=json.dumps([{"id": self.article.id, "title": "Bulk modified"}]),
+            content_type="application/json",
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ArticleFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.article = Article.objects.create(title="Fake Article 1", content="Long text", author=self.author)
+        self.article.regions.set([self.region])
+        self.detail_url = reverse("article", kwargs={"article_id": self.article.id})
+        region_lookup.snapshot()
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, " ".join(query["sql"] for query in queries)
+
+    def test_fields_prune_output_and_sql(self):
+        response, sql = self.get(self.url, fields="title")
+        self.assertEqual(response.json(), [{"id": self.article.id, "title": "Fake Article 1"}])
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn("authors_author", sql)
+        self.assertNotIn("articles_article_regions", sql)
+
+    def test_include_adds_relations(self):
+        response, sql = self.get(self.url, include="author")
+        self.assertEqual(list(response.json()[0]), ["id", "title", "content", "author"])
+        self.assertNotIn("articles_article_regions", sql)
+        response, sql = self.get(self.url, fields="title", include="regions")
+        self.assertEqual(
+            response.json(),
+            [{
+                "id": self.article.id,
+                "title": "Fake Article 1",
+                "regions": [{"id": self.region.id, "code": "AL", "name": "Albania"}],
+            }],
+        )
+        self.assertNotIn("authors_author", sql)
+
+    def test_detail(self):
+        response, sql = self.get(self.detail_url, fields="id,title")
+        self.assertEqual(response.json(), {"id": self.article.id, "title": "Fake Article 1"})
+        self.assertNotIn('"content"', sql)
+        self.assertNotEqual(response["ETag"], self.client.get(self.detail_url)["ETag"])
+        self.assertEqual(self.client.get(self.detail_url, {"fields": "title"})["ETag"], response["ETag"])
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {"fields": "title,secret"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"include": "title"}).status_code, 400)
+        self.assertEqual(self.client.get(self.detail_url, {"include": "editor"}).status_code, 400)
+
+
+class ArticleResponseEncodingTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        Article.objects.bulk_create([Article(title=f"Article {i}", content="Ünïcode " * 20) for i in range(20)])
+        # bulk_create sends no signals: a list cached by an earlier test
+        # would still be served
+        response_cache.bump(Article)
+
+    def test_compact_json_with_either_encoder(self):
+        bodies = []
+        for encoder in ("django_article.encoders.stdlib_encode", "django_article.encoders.orjson_encode"):
+            with self.settings(JSON_ENCODER=encoder, RESPONSE_CACHE_ENABLED=False):
+                bodies.append(self.client.get(self.url, {"fields": "title"}).content)
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertTrue(bodies[0].startswith(b'[{"id":1,"title":"Article 0"},'))
+
+    def test_gzip_above_minimum_size(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+        revalidated = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+        small = self.client.get(self.url, {"limit": 1, "fields": "id"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(small.has_header("Content-Encoding"))
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertFalse(refused.has_header("Content-Encoding"))
+
+    def test_detail_keeps_its_etag_when_revalidated_with_gzip(self):
+        url = reverse("article", args=(Article.objects.first().id,))
+        with self.settings(COMPRESSION_MIN_SIZE=1):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertTrue(response["ETag"].startswith("W/"))
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+    @skipUnless(middleware.brotli, "brotli is not installed")
+    def test_brotli_is_preferred(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(response.content), self.client.get(self.url).content)
+
+    async def test_streams_compressed_chunks(self):
+        expected = (await self.async_client.get(self.url, {"limit": 100})).json()
+        response = await self.async_client.get(self.url, {"stream": "true"}, ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(gzip.decompress(content)), expected)
+
+
+class ArticleInstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.article = Article.objects.create(title="Article", content="Content")
+        self.article.regions.set([Region.objects.create(code="AL", name="Albania")])
+        region_lookup.invalidate()
+
+    def server_timing(self, response):
+        return dict(metric.strip().split(";", 1) for metric in response["Server-Timing"].split(","))
+
+    def test_server_timing(self):
+        # Warm the region snapshot, the detail view then takes 3 queries
+        self.client.get(self.url)
+        response = self.client.get(reverse("article", args=[self.article.id]))
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {"db", "serialize", "encode", "total"})
+        self.assertIn('desc="3 queries"', timing["db"])
+        self.assertRegex(timing["total"], r"^dur=\d+\.\d\d$")
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_metrics_histograms_per_route(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        metrics = self.client.get(reverse("metrics"))
+        self.assertEqual(metrics["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        lines = metrics.content.decode().splitlines()
+        self.assertIn("# TYPE django_article_request_duration_seconds histogram", lines)
+        count = next(
+            int(line.split()[-1]) for line in lines
+            if line.startswith('django_article_request_duration_seconds_count{route="articles-list"}')
+        )
+        self.assertGreaterEqual(count, 2)
+        self.assertIn(f'django_article_db_queries_bucket{{route="articles-list",le="+Inf"}} {count}', lines)
+        self.assertTrue(any(line.startswith('django_article_encode_duration_seconds_sum{route="articles-list"}') for line in lines))
+
+
+class ArticleListResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.article = Article.objects.create(title="Fake Article 1", author=self.author)
+        self.article.regions.set([self.region])
+
+    def test_second_read_is_served_from_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_key_ignores_parameter_and_code_order(self):
+        Region.objects.create(code="UK", name="United Kingdom")
+        self.client.get(self.url, {"region_code": "AL,UK", "region_match": "any"})
+        response = self.client.get(f"{self.url}?region_match=any&region_code=UK,AL")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(self.url, {"region_code": "AL"})["X-Cache"], "MISS")
+        self.client.get(self.url, {"fields": "title,id", "include": "regions,author"})
+        response = self.client.get(self.url, {"fields": "id,title", "include": "author,regions"})
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_key_keeps_the_order_of_other_parameters(self):
+        # q is free text rather than a set of values
+        self.client.get(self.url, {"q": "fake,article"})
+        self.assertEqual(self.client.get(self.url, {"q": "article,fake"})["X-Cache"], "MISS")
+        self.client.get(f"{self.url}?limit=1&limit=2")
+        response = self.client.get(f"{self.url}?limit=2&limit=1")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()), 1)
+
+    def test_writes_invalidate_cached_lists(self):
+        def titles():
+            response = self.client.get(self.url)
+            self.assertEqual(response["X-Cache"], "MISS")
+            self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+            return [article["title"] for article in response.json()]
+
+        self.assertEqual(titles(), ["Fake Article 1"])
+        self.client.post(self.url, data=json.dumps({"title": "Fake Article 2"}), content_type="application/json")
+        self.assertEqual(titles(), ["Fake Article 1", "Fake Article 2"])
+        detail_url = reverse("article", kwargs={"article_id": self.article.id})
+        self.client.put(detail_url, data=json.dumps({"title": "Modified"}), content_type="application/json")
+        self.assertEqual(titles(), ["Modified", "Fake Article 2"])
+        self.client.post(
+            reverse("articles-bulk"),
+            data=json.dumps([{"id": self.article.id, "title": "Bulk modified"}]),
+            content_type="application/json",
+        )
+        self.assertEqual(titles(), ["Bulk modified", "Fake Article 2"])
+        self.author.last_name = "Bennington"
+        self.author.save()
+        self.assertEqual(titles(), ["Bulk modified", "Fake Article 2"])
+        self.client.delete(detail_url)
+        self.assertEqual(titles(), ["Fake Article 2"])
+
+    def test_writes_of_other_processes_invalidate_cached_lists(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        script = (
+            "from django_article.articles.models import Article\n"
+            "from django_article.response_cache import response_cache\n"
+            "response_cache.bump(Article)\n"
+        )
+        subprocess.run(
+            [sys.executable, "manage.py", "shell", "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))), check=True,
+        )
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+    def test_stream_mode_and_disabled_cache_bypass(self):
+        self.assertFalse(self.client.get(self.url, {"stream": "true"}).has_header("X-Cache"))
+        # Parsed like the view does: these are not streamed, so are cached
+        for value in ("0", "false", ""):
+            self.client.get(self.url, {"stream": value})
+            self.assertEqual(self.client.get(self.url, {"stream": value})["X-Cache"], "HIT", value)
+        with self.settings(RESPONSE_CACHE_ENABLED=False):
+            self.assertFalse(self.client.get(self.url).has_header("X-Cache"))
+
+    def test_stats(self):
+        before = self.client.get(reverse("cache-stats")).json()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = self.client.get(reverse("cache-stats")).json()
+        self.assertEqual(stats["hits"], before["hits"] + 1)
+        self.assertEqual(stats["misses"], before["misses"] + 1)
+        self.assertEqual(stats["max_entries"], 1000)
+
+
+class ArticlePatchTestCase(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.regions = [Region.objects.create(code="AL", name="Albania"), Region.objects.create(code="UK", name="United Kingdom")]
+        self.article = Article.objects.create(title="Dogs", content="About dogs", author=self.author)
+        self.article.regions.set(self.regions)
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+        self.document = {
+            "title": "Dogs", "content": "About dogs", "author": {"id": self.author.id},
+            "regions": [{"id": region.id} for region in self.regions],
+        }
+        region_lookup.invalidate()
+
+    def send(self, method, payload):
+        return self.client.generic(method, self.url, json.dumps(payload), content_type="application/json")
+
+    def test_patch_changes_only_the_given_fields(self):
+        response = self.send("PATCH", {"title": "Cats"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Write"], "UPDATED")
+        self.assertEqual(response.json()["title"], "Cats")
+        self.assertEqual(response.json()["content"], "About dogs")
+        self.assertEqual(response.json()["author"]["id"], self.author.id)
+        self.assertEqual(len(response.json()["regions"]), 2)
+        self.assertEqual(self.send("PATCH", {"title": ""}).status_code, 400)
+
+    def test_unchanged_document_is_not_written(self):
+        etag = self.client.get(self.url)["ETag"]
+        region_lookup.snapshot()
+        for method, payload in (("PUT", self.document), ("PATCH", {"regions": self.document["regions"][::-1]})):
+            # The article, the author and the links are read, nothing is written
+            with CaptureQueriesContext(connection) as queries:
+                response = self.send(method, payload)
+            self.assertEqual(response["X-Write"], "UNCHANGED")
+            self.assertFalse([q for q in queries if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))])
+        self.assertEqual(self.client.get(self.url)["ETag"], etag)
+
+    def test_region_change_alone_moves_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.send("PATCH", {"regions": [{"id": self.regions[0].id}]})
+        self.assertEqual(response["X-Write"], "UPDATED")
+        self.assertEqual(list(self.article.regions.all()), self.regions[:1])
+        self.assertNotEqual(self.client.get(self.url)["ETag"], etag)
+
+
 class ArticleViewTestCase(TestCase):
     def setUp(self):
         self.author = Author.objects.create(first_name="Henry", last_name="Benington")
@@ -1,53 +1,175 @@
 import json
+from asgiref.sync import sync_to_async
 from marshmallow import ValidationError
+from django.conf import settings
+from django.db import transaction
 from django.views.generic import View
-from django_article.articles.models import Article
-from django_article.articles.schemas import ArticleSchema
-from django_article.utils import json_response
+from django_article.articles.bulk import bulk_save, parse_documents
+from django_article.articles.models import REGION_MATCH_MODES, Article, related_version_names, related_versions
+from django_article.articles.schemas import ArticleSchema, article_serializer
+from django_article.articles.search import search_response
+from django_article.authors.models import Author
+from django_article.conditional import variant_etag
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+from django_article.response_cache import cached_list
+from django_article.stats.counters import batched
+from django_article.utils import (
+    FieldsetError, conditional_json_response, json_response, paginated_response, parse_fieldset,
+    stream_json_response, wants_stream, write_headers,
+)
 
 
 class ArticlesListView(View):
-    def get(self, request, *args, **kwargs):
-        region_code_qr = request.GET.get('region_code', None)
-        if region_code_qr:
-            region_codes = region_code_qr.split(',')
+    @cached_list(Article, Author, Region)
+    async def get(self, request, *args, **kwargs):
+        try:
+            serializer = article_serializer.subset(parse_fieldset(request, ArticleSchema, article_serializer.relations))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        article_qs = Article.objects.all()
+        region_codes = [code for code in request.GET.get('region_code', '').split(',') if code]
+        if region_codes:
+            region_match = request.GET.get('region_match', 'all')
+            if region_match not in REGION_MATCH_MODES:
+                error = f"region_match must be one of {', '.join(REGION_MATCH_MODES)}"
+                return json_response({"error": error}, 400)
+            article_qs = article_qs.filter_regions(
+                region_codes, region_match, await region_lookup.acovering(codes=region_codes)
+            )
+        text = request.GET.get('q', '').strip()
+        if text:
+            if wants_stream(request):
+                return json_response({"error": "stream is not supported with q"}, 400)
+            return await search_response(request, article_qs, serializer, text)
+        if wants_stream(request):
+            return stream_json_response(request, article_qs, serializer)
+        return await paginated_response(request, article_qs, serializer)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            article, _ = await sync_to_async(save_article)(json.loads(request.body))
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        return json_response(article, 201)
+
+
+class AuthorArticlesView(View):
+    @cached_list(Article, Author, Region)
+    async def get(self, request, author_id, *args, **kwargs):
+        try:
+            serializer = article_serializer.subset(parse_fieldset(request, ArticleSchema, article_serializer.relations))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        if not await Author.objects.filter(pk=author_id).aexists():
+            return json_response({"error": "No Author matches the given query"}, 404)
+        # Paged through the (author_id, id) index
+        return await paginated_response(request, Article.objects.filter(author=author_id), serializer)
+
+
+class RegionArticlesView(View):
+    @cached_list(Article, Author, Region)
+    async def get(self, request, region_id, *args, **kwargs):
+        try:
+            serializer = article_serializer.subset(parse_fieldset(request, ArticleSchema, article_serializer.relations))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        if region_id not in (await region_lookup.acovering(ids=[region_id])).by_id:
+            return json_response({"error": "No Region matches the given query"}, 404)
+        return await paginated_response(
+            request, Article.objects.filter(regions=region_id), serializer, keyset=region_keyset(region_id)
+        )
+
 
-            # article_qs.filter(regions__in=region_codes)  # only one filter
+def region_keyset(region_id):
+    # The (region_id, article_id) index of the through table already holds a
+    # region's articles in id order; ordering by the joined article's id
+    # instead would sort every article of the region past the cursor.
+    def keyset(after, relations):
+        links = Article.regions.through.objects.filter(region_id=region_id, article_id__gt=after)
+        versions = related_versions(relations, f"{links.model._meta.db_table}.article_id", "article__")
+        links = links.annotate(**versions).order_by("article_id")
+        return links.values_list("article_id", "article__version", *related_version_names(relations))
+    return keyset
 
-            article_qs = Article.objects.filter()
-            for r_code in region_codes:  # multiple regions filter
-                article_qs = article_qs.filter(regions__code=r_code)
-        else:
-            article_qs = Article.objects.all()
-        return json_response(ArticleSchema().dump(article_qs, many=True))
 
+class ArticlesBulkView(View):
     def post(self, request, *args, **kwargs):
         try:
-            article = ArticleSchema().load(json.loads(request.body))
-        except ValidationError as e:
-            return json_response(e.messages, 400)
-        return json_response(ArticleSchema().dump(article), 201)
+            documents = parse_documents(request.body, ndjson=request.content_type == "application/x-ndjson")
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
+        if len(documents) > settings.BULK_MAX_ITEMS:
+            return json_response({"error": f"At most {settings.BULK_MAX_ITEMS} items per request"}, 400)
+        return json_response(bulk_save(documents))
 
 
 class ArticleView(View):
-    def dispatch(self, request, article_id, *args, **kwargs):
+    async def dispatch(self, request, article_id, *args, **kwargs):
         try:
-            self.article = Article.objects.get(pk=article_id)
+            self.article = await self.articles(request.method).aget(pk=article_id)
         except Article.DoesNotExist:
             return json_response({"error": "No Article matches the given query"}, 404)
         self.data = request.body and dict(json.loads(request.body), id=self.article.id)
-        return super(ArticleView, self).dispatch(request, *args, **kwargs)
+        return await super(ArticleView, self).dispatch(request, *args, **kwargs)
 
-    def get(self, request, *args, **kwargs):
-        return json_response(ArticleSchema().dump(self.article))
+    def articles(self, method):
+        # Only the validators for a GET, which dumps the requested fields by
+        # itself. A delete needs the author the article is counted for, and
+        # PUT and PATCH compare the payload with every column.
+        if method == "GET":
+            return Article.objects.only("id", "version").with_related_versions()
+        if method == "DELETE":
+            return Article.objects.only("id", "version", "updated_at", "author_id")
+        return Article.objects.all()
 
-    def put(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         try:
-            self.article = ArticleSchema().load(self.data)
+            self.serializer = article_serializer.subset(
+                parse_fieldset(request, ArticleSchema, article_serializer.relations)
+            )
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        # No Last-Modified: the article's updated_at does not move with its
+        # author or regions
+        etag = variant_etag(self.article.etag, self.serializer.etag_key)
+        return await conditional_json_response(request, etag, None, self.dump)
+
+    async def dump(self):
+        [article] = await self.serializer.adump(Article.objects.filter(pk=self.article.pk))
+        return article
+
+    async def put(self, request, *args, **kwargs):
+        return await self.write()
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.write(partial=True)
+
+    async def write(self, partial=False):
+        try:
+            article, written = await sync_to_async(save_article)(self.data, self.article, partial)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(ArticleSchema().dump(self.article))
+        return json_response(article, headers=write_headers(written))
 
-    def delete(self, request, *args, **kwargs):
-        self.article.delete()
+    async def delete(self, request, *args, **kwargs):
+        await sync_to_async(delete_article)(self.article)
         return json_response()
+
+
+def save_article(data, instance=None, partial=False):
+    """
+    Loads `data` with ArticleSchema, which writes through the sync ORM in
+    its post_load, in one transaction with the counters it moves. Returns
+    the dumped article and whether anything was written.
+    """
+    schema = ArticleSchema(context={"instance": instance})
+    with transaction.atomic(), batched():
+        article = schema.dump(schema.load(data, partial=partial))
+    return article, schema.context["written"]
+
+
+def delete_article(article):
+    """Deletes `article` in one transaction with the counters it moves."""
+    with transaction.atomic(), batched():
+        article.delete()
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_article.settings')
+# The API profile: see ADMIN_ENABLED in the settings
+os.environ.setdefault('DJANGO_ADMIN', '0')
+# See DATABASES in the settings
+os.environ.setdefault('DJANGO_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'django_article.authors'
+
+    def ready(self):
+        from django_article.authors import signals  # noqa: F401
@@ -1,6 +1,13 @@
 from django.db import models
 
+from django_article.models import VersionedModel
 
-class Author(models.Model):
+
+class Author(VersionedModel):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
+
+    class Meta(object):
+        indexes = [
+            models.Index(fields=["last_name", "first_name"], name="author_name_idx"),
+        ]
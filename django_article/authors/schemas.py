@@ -1,15 +1,16 @@
 from marshmallow import validate
 from marshmallow import fields
-from marshmallow import Schema
 from marshmallow.decorators import post_load
 
 from django_article.authors.models import Author
+from django_article.serializers import CompiledSerializer, Schema
 from django_article.utils import must_not_be_blank
 
 
 class AuthorSchema(Schema):
     class Meta(object):
         model = Author
+        ordered = True
 
     id = fields.Integer()
     first_name = fields.String(required=True, validate=[validate.Length(max=255), must_not_be_blank])
@@ -17,7 +18,11 @@ class AuthorSchema(Schema):
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
-        region, _ = Author.objects.update_or_create(
-            id=data.pop("id", None), defaults=data
-        )
-        return region
+        # The view passes the author it loaded as the "instance" context,
+        # and learns from "written" whether anything changed
+        author, created = Author.objects.update_or_create_by_id(data.pop("id", None), data, self.context.get("instance"))
+        self.context["written"] = created or bool(author.changed_fields)
+        return author
+
+
+author_serializer = CompiledSerializer(AuthorSchema)
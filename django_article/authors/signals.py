@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django_article.authors.models import Author
+from django_article.response_cache import response_cache
+
+
+@receiver([post_save, post_delete], sender=Author)
+def bump_author_generation(sender, **kwargs):
+    response_cache.bump_on_commit(Author)
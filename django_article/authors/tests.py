@@ -4,6 +4,7 @@ from django.test import TestCase
 from django.urls import reverse
 
 from django_article.authors.models import Author
+from django_article.authors.schemas import AuthorSchema, author_serializer
 
 
 class AuthorListViewTestCase(TestCase):
@@ -53,6 +54,26 @@ class AuthorListViewTestCase(TestCase):
             response.json(),
         )
 
+    def test_paginates_with_cursor(self):
+        response = self.client.get(self.url, {"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a["id"] for a in response.json()], [self.author_1.id])
+        response = self.client.get(self.url, {"limit": 1, "cursor": response["X-Next-Cursor"]})
+        self.assertEqual([a["id"] for a in response.json()], [self.author_2.id])
+        self.assertFalse(response.has_header("X-Next-Cursor"))
+
+    async def test_streams_all_authors(self):
+        expected = (await self.async_client.get(self.url)).json()
+        response = await self.async_client.get(self.url, {"stream": "true"})
+        self.assertTrue(response.streaming)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(content), expected)
+
+    def test_compiled_dump_is_byte_identical_to_schema(self):
+        Author.objects.create(first_name="Ünï", last_name="Çødé")
+        authors = Author.objects.order_by("pk")
+        self.assertEqual(json.dumps(author_serializer.dump(authors)), json.dumps(AuthorSchema(many=True).dump(authors)))
+
 
 class AuthorViewTestCase(TestCase):
     def setUp(self):
@@ -74,6 +95,13 @@ class AuthorViewTestCase(TestCase):
             },
         )
 
+    def test_sparse_fieldset(self):
+        response = self.client.get(self.url, {"fields": "last_name"})
+        self.assertEqual(response.json(), {"id": self.author.id, "last_name": "Calvert"})
+        response = self.client.get(reverse("authors-list"), {"fields": "first_name"})
+        self.assertEqual(response.json(), [{"id": self.author.id, "first_name": "Jonny"}])
+        self.assertEqual(self.client.get(self.url, {"include": "articles"}).status_code, 400)
+
     def test_updates_author(self):
         self.updated_author = {
             "first_name": "Deborah",
@@ -98,6 +126,44 @@ class AuthorViewTestCase(TestCase):
             response.json(),
         )
 
+    def test_update_query_count(self):
+        # The author and its update, in a savepoint of the test's
+        # transaction; its articles are not written
+        payload = {"first_name": "Deborah", "last_name": "Glenn"}
+        with self.assertNumQueries(4):
+            response = self.client.put(self.url, data=json.dumps(payload), content_type="application/json")
+        self.assertEqual(response["X-Write"], "UPDATED")
+
+    def test_patch_updates_given_fields(self):
+        response = self.client.patch(self.url, data=json.dumps({"last_name": "Glenn"}), content_type="application/json")
+        self.assertEqual(response.json(), {"id": self.author.id, "first_name": "Jonny", "last_name": "Glenn"})
+        self.assertEqual(response["X-Write"], "UPDATED")
+        response = self.client.patch(self.url, data=json.dumps({"last_name": ""}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_document_is_not_written(self):
+        etag = self.client.get(self.url)["ETag"]
+        for method, payload in (("put", self.author_name), ("patch", {"first_name": "Jonny"})):
+            # Only the author is read
+            with self.assertNumQueries(3):
+                response = getattr(self.client, method)(self.url, data=json.dumps(payload), content_type="application/json")
+            self.assertEqual(response["X-Write"], "UNCHANGED")
+        self.assertEqual(self.client.get(self.url)["ETag"], etag)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.client.put(self.url, data=json.dumps({"first_name": "Deborah", "last_name": "Glenn"}),
+                        content_type="application/json")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+        list_url = reverse("authors-list")
+        etag = self.client.get(list_url)["ETag"]
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Author.objects.create(first_name="Tomas", last_name="Fulton")
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
     def test_removes_author(self):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, 200)
@@ -1,46 +1,90 @@
 import json
 
+from asgiref.sync import sync_to_async
 from marshmallow import ValidationError
+from django.db import transaction
 from django.views.generic import View
 
 from django_article.authors.models import Author
-from django_article.authors.schemas import AuthorSchema
-from django_article.utils import json_response
+from django_article.authors.schemas import AuthorSchema, author_serializer
+from django_article.response_cache import cached_list
+from django_article.stats.counters import batched
+from django_article.conditional import variant_etag
+from django_article.utils import (
+    FieldsetError, conditional_json_response, json_response, paginated_response, parse_fieldset,
+    stream_json_response, wants_stream, write_headers,
+)
 
 
 class AuthorsListView(View):
-    def get(self, request, *args, **kwargs):
-        return json_response(AuthorSchema().dump(Author.objects.all(), many=True))
+    @cached_list(Author)
+    async def get(self, request, *args, **kwargs):
+        try:
+            serializer = author_serializer.subset(parse_fieldset(request, AuthorSchema))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        if wants_stream(request):
+            return stream_json_response(request, Author.objects.all(), serializer)
+        return await paginated_response(request, Author.objects.all(), serializer)
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         try:
             json_body = json.loads(request.body)
             json_body.pop('id', '')
-            author = AuthorSchema().load(json_body)
+            author, _ = await sync_to_async(save_author)(json_body)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(AuthorSchema().dump(author), 201)
+        return json_response(author, 201)
 
 
 class AuthorView(View):
-    def dispatch(self, request, author_id, *args, **kwargs):
+    async def dispatch(self, request, author_id, *args, **kwargs):
+        try:
+            self.only = parse_fieldset(request, AuthorSchema) if request.method == "GET" else None
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        authors = Author.objects.all()
+        if self.only is not None:
+            authors = authors.only("version", "updated_at", *self.only)
         try:
-            self.author = Author.objects.get(pk=author_id)
+            self.author = await authors.aget(pk=author_id)
         except Author.DoesNotExist:
             return json_response({"error": "No Author matches the given query"}, 404)
         self.data = request.body and dict(json.loads(request.body), id=self.author.id)
-        return super(AuthorView, self).dispatch(request, *args, **kwargs)
+        return await super(AuthorView, self).dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        etag = variant_etag(self.author.etag, () if self.only is None else (self.only,))
+        return await conditional_json_response(request, etag, self.author.updated_at, self.dump)
+
+    async def dump(self):
+        return AuthorSchema(only=self.only).dump(self.author)
 
-    def get(self, request, *args, **kwargs):
-        return json_response(AuthorSchema().dump(self.author))
+    async def put(self, request, *args, **kwargs):
+        return await self.write()
 
-    def put(self, request, *args, **kwargs):
+    async def patch(self, request, *args, **kwargs):
+        return await self.write(partial=True)
+
+    async def write(self, partial=False):
         try:
-            self.author = AuthorSchema().load(self.data)
+            author, written = await sync_to_async(save_author)(self.data, self.author, partial)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(AuthorSchema().dump(self.author))
+        return json_response(author, headers=write_headers(written))
 
-    def delete(self, request, *args, **kwargs):
-        self.author.delete()
+    async def delete(self, request, *args, **kwargs):
+        await self.author.adelete()
         return json_response()
+
+
+def save_author(data, instance=None, partial=False):
+    """
+    Loads `data` with AuthorSchema, which writes through the sync ORM in
+    its post_load, in one transaction with the counters it moves. Returns
+    the dumped author and whether anything was written.
+    """
+    schema = AuthorSchema(context={"instance": instance})
+    with transaction.atomic(), batched():
+        author = schema.dump(schema.load(data, partial=partial))
+    return author, schema.context["written"]
@@ -0,0 +1,46 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def page_etag(model, limit, rows, key=()):
+    """
+    ETag of a page from its `(id, version, ...)` rows, as returned by
+    `validators()`. `key` holds anything else the page's body depends on.
+    Pages get no Last-Modified: the newest `updated_at` of the rows left
+    does not move when one is deleted.
+    """
+    return make_etag(model._meta.label, limit, *key, *rows)
+
+
+def instances_etag(model, limit, instances, key=()):
+    return make_etag(model._meta.label, limit, *key, *[(instance.pk, instance.version) for instance in instances])
+
+
+def variant_etag(etag, key=()):
+    """ETag of another representation (e.g. a sparse fieldset) of the same version."""
+    return make_etag(etag, *key) if key else etag
+
+
+def add_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Evaluates If-None-Match/If-Modified-Since against the validators, before
+    anything is serialized. Returns the 304 response, or None when the
+    client's copy is stale.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+    )
+    return response and add_validators(response, etag, last_modified)
@@ -0,0 +1,158 @@
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Upper bounds in seconds, from a cached page to a slow full-text search
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings(object):
+    """What one request spent its time on, in seconds. Set by InstrumentationMiddleware."""
+    __slots__ = ("queries", "db", "serialize", "encode", "active")
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.serialize = self.encode = 0.0
+        self.active = set()
+
+
+class timed(object):
+    """
+    Adds the time spent in the block to the `serialize` or `encode` timing
+    of the current request, if any. Nested blocks of the same name, e.g. a
+    schema dumping its relations, are counted once.
+    """
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = current_timings.get()
+        if timings is None or self.name in timings.active:
+            self.timings = None
+            return
+        timings.active.add(self.name)
+        self.timings = timings
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        if timings is not None:
+            setattr(timings, self.name, getattr(timings, self.name) + perf_counter() - self.start)
+            timings.active.discard(self.name)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += perf_counter() - start
+
+
+def install_query_timer(connection):
+    # Installed for the lifetime of the connection wrapper rather than per
+    # request with `connection.execute_wrapper()`: async views run their
+    # queries on another thread, with its own connections.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_timers():
+    """Times the queries of the connections this thread opened already."""
+    for connection in connections.all(initialized_only=True):
+        install_query_timer(connection)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+connection_created.connect(on_connection_created)
+
+
+class Histogram(object):
+    """A Prometheus histogram with one series per route."""
+
+    def __init__(self, name, help, buckets):
+        self.name, self.help, self.buckets = name, help, buckets
+        self.series = {}
+
+    def observe(self, route, value):
+        # Counts per bucket, then the sum and the count
+        series = self.series.get(route)
+        if series is None:
+            series = self.series.setdefault(route, [0] * (len(self.buckets) + 1) + [0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for route, series in sorted(self.series.items()):
+            label = 'route="{}"'.format(route.replace("\\", "\\\\").replace('"', '\\"'))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Metrics(object):
+    """
+    Histograms of the request timings, per route name. Like the response
+    cache counters they are per process: scrape every worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duration = Histogram(
+            "django_article_request_duration_seconds", "Time to build the response.", DURATION_BUCKETS
+        )
+        self.queries = Histogram("django_article_db_queries", "Database queries per request.", QUERY_BUCKETS)
+        self.db = Histogram("django_article_db_duration_seconds", "Time spent in database queries.", DURATION_BUCKETS)
+        self.serialize = Histogram(
+            "django_article_serialize_duration_seconds", "Time spent dumping data with the schemas.", DURATION_BUCKETS
+        )
+        self.encode = Histogram(
+            "django_article_encode_duration_seconds", "Time spent encoding JSON.", DURATION_BUCKETS
+        )
+
+    def observe(self, route, timings, total):
+        with self._lock:
+            self.duration.observe(route, total)
+            self.queries.observe(route, timings.queries)
+            self.db.observe(route, timings.db)
+            self.serialize.observe(route, timings.serialize)
+            self.encode.observe(route, timings.encode)
+
+    def render(self):
+        histograms = (self.duration, self.queries, self.db, self.serialize, self.encode)
+        with self._lock:
+            lines = [line for histogram in histograms for line in histogram.render()]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def server_timing(timings, total):
+    return (
+        f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries", '
+        f"serialize;dur={timings.serialize * 1000:.2f}, "
+        f"encode;dur={timings.encode * 1000:.2f}, "
+        f"total;dur={total * 1000:.2f}"
+    )
@@ -0,0 +1,252 @@
+import math
+import zlib
+from time import perf_counter, time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from django_article.instrumentation import (
+    RequestTimings, current_timings, install_query_timers, metrics, server_timing,
+)
+from django_article.replication.router import read_after, read_from, replica_status
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+# Quality 11 is meant for static assets; 5 keeps most of the gain at a
+# fraction of the CPU time for dynamic responses.
+BROTLI_QUALITY = 5
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# When the client last wrote, as a timestamp
+WRITTEN_AT_COOKIE = "written_at"
+
+
+def accepted_encodings(header):
+    """The content codings of an Accept-Encoding header that are not refused with q=0."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate_encoding(request):
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class Compressor(object):
+    def __init__(self, encoding):
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.flush, self.finish = (
+                self.compressor.process, self.compressor.flush, self.compressor.finish
+            )
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress = self.compressor.compress
+            self.flush = lambda: self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+    def chunk(self, data):
+        # Flushed on every chunk, so each batch reaches the client right away
+        return self.compress(data) + self.flush()
+
+    def whole(self, data):
+        return self.compress(data) + self.finish()
+
+    def iterate(self, chunks):
+        for chunk in chunks:
+            data = self.chunk(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+    async def aiterate(self, chunks):
+        async for chunk in chunks:
+            data = self.chunk(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses responses with brotli (when installed) or gzip, whichever
+    the client accepts. Regular responses under COMPRESSION_MIN_SIZE bytes
+    are sent as they are; streaming responses are compressed chunk by chunk.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(request)
+        if encoding is None:
+            return response
+        # The compressed bytes differ from the identity encoding, so a strong
+        # ETag must not be shared. It is weakened whenever an encoding is
+        # negotiated, whether or not this body is large enough to compress:
+        # a 304 has no body to tell, and must repeat the 200's validator.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        compressor = Compressor(encoding)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compressor.aiterate(response.streaming_content)
+            else:
+                response.streaming_content = compressor.iterate(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            response.content = compressor.whole(response.content)
+            response.headers["Content-Length"] = str(len(response.content))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class InstrumentationMiddleware(object):
+    """
+    Times every request per route name: database queries, schema dumps,
+    JSON encoding and the total. The timings are sent back in a
+    Server-Timing header and aggregated into the histograms served at
+    /metrics. Streamed bodies are produced after the headers are sent and
+    only count up to the first byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    def start(self):
+        install_query_timers()
+        timings = RequestTimings()
+        return timings, current_timings.set(timings), perf_counter()
+
+    def finish(self, request, response, timings, start):
+        total = perf_counter() - start
+        match = request.resolver_match
+        metrics.observe(match.url_name if match and match.url_name else "unmatched", timings, total)
+        response.headers["Server-Timing"] = server_timing(timings, total)
+        return response
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+    Chooses the database ReplicaRouter sends the reads of a request to,
+    once, so that they all see the same state: a request that writes reads
+    from the primary only, and after a write the client is sent a cookie so
+    that its reads for the next REPLICA_MAX_LAG seconds only go to the
+    replicas that have its write (read-your-writes). Reads outside of the
+    requests it sees stay on the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        after = self.read_after(request)
+        tokens = read_after.set(after), read_from.set(replica_status.choose(after))
+        try:
+            response = self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.remember_write(request, response)
+
+    async def __acall__(self, request):
+        after = self.read_after(request)
+        # Choosing may read the replicas' heartbeats
+        alias = await sync_to_async(replica_status.choose)(after) if settings.DATABASE_REPLICAS else None
+        tokens = read_after.set(after), read_from.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.remember_write(request, response)
+
+    def reset(self, tokens):
+        after_token, from_token = tokens
+        read_from.reset(from_token)
+        read_after.reset(after_token)
+
+    def read_after(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if request.method not in SAFE_METHODS:
+            return math.inf
+        try:
+            written_at = float(request.COOKIES[WRITTEN_AT_COOKIE])
+        except (KeyError, ValueError):
+            return 0
+        return written_at if math.isfinite(written_at) and written_at > 0 else 0
+
+    def remember_write(self, request, response):
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            # Taken after the commit, so a replica with a later heartbeat has the write
+            response.set_cookie(
+                WRITTEN_AT_COOKIE, f"{time():.6f}", max_age=settings.REPLICA_MAX_LAG, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,74 @@
+from django.db import models
+
+from django_article.conditional import make_etag
+
+
+class VersionedQuerySet(models.QuerySet):
+    def validators(self, relations=()):
+        """
+        The `(id, version, ...)` rows the ETag of a page is made from, with
+        what the embedded `relations` add to it.
+        """
+        return self.values_list("id", "version")
+
+    def update_or_create_by_id(self, id, defaults, instance=None):
+        """
+        update_or_create() by primary key. Without an id the row is created
+        right away: looking up `id IS NULL` first would scan the whole table.
+        An `instance` the caller already loaded is updated instead of being
+        selected again. Only the columns that changed are written, and
+        nothing at all if none did.
+        """
+        if id is None:
+            return self.create(**defaults), True
+        if instance is None or instance.pk != id:
+            instance = self.filter(pk=id).first()
+            if instance is None:
+                return self.create(id=id, **defaults), True
+        if instance.assign(defaults):
+            instance.save(using=self.db, update_fields=instance.changed_fields)
+        return instance, False
+
+
+class VersionedModel(models.Model):
+    """
+    Tracks when and how often a row was modified, to back the ETag
+    validators of the API views and the Last-Modified of the author and
+    region detail views.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = VersionedQuerySet.as_manager()
+    # Set by assign()
+    changed_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version", "updated_at"}
+        super(VersionedModel, self).save(*args, **kwargs)
+
+    def assign(self, values):
+        """
+        Sets `values` on the instance and records the names of the fields
+        whose value differs in `changed_fields`, which is returned. Fields
+        that were not loaded count as changed.
+        """
+        deferred = self.get_deferred_fields()
+        self.changed_fields = []
+        for name, value in values.items():
+            attname = self._meta.get_field(name).attname
+            new = value.pk if isinstance(value, models.Model) else value
+            if attname in deferred or getattr(self, attname) != new:
+                self.changed_fields.append(name)
+            setattr(self, name, value)
+        return self.changed_fields
+
+    @property
+    def etag(self):
+        return make_etag(self._meta.label, self.pk, self.version)
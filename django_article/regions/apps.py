@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RegionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'django_article.regions'
+
+    def ready(self):
+        from django_article.regions import signals  # noqa: F401
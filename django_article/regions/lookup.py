@@ -0,0 +1,174 @@
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from django_article.regions.models import Region
+from django_article.regions.schemas import region_serializer
+
+VERSION_KEY = "regions:lookup:version"
+
+Snapshot = namedtuple("Snapshot", ["ids", "by_id", "by_code", "dumped"])
+
+
+class RegionLookup(object):
+    """
+    Process-local snapshot of the Region table, keyed by id and by code and
+    holding the serialized form of every region. It is loaded lazily on first
+    use and dropped by the post_save/post_delete signals, so resolving regions
+    costs no queries while the table is unchanged.
+
+    With REGION_LOOKUP_SHARED_VERSION enabled, a version stamp kept in the
+    default cache also invalidates the snapshots of the other processes; that
+    costs one cache read per access and needs a shared cache backend.
+    Returned instances and dicts are shared and must be treated as read-only.
+    It is loaded from the primary: it is dropped when a write commits there.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+        if settings.REGION_LOOKUP_SHARED_VERSION:
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.add(VERSION_KEY, 1)
+
+    def invalidate_on_commit(self):
+        # Drop it right away for this connection, and again once the write is
+        # visible to everyone else.
+        self.invalidate()
+        transaction.on_commit(self.invalidate)
+
+    def snapshot(self):
+        version = self._shared_version()
+        snapshot = self._snapshot
+        if snapshot is None or version != self._version:
+            with self._lock:
+                generation = self._generation
+                snapshot = self._store(generation, version, list(self._regions()))
+        return snapshot
+
+    async def asnapshot(self):
+        # Same as snapshot(), reading through the async ORM. Concurrent cold
+        # loads are not serialized; the last one to finish is kept.
+        version = self._shared_version()
+        snapshot = self._snapshot
+        if snapshot is None or version != self._version:
+            generation = self._generation
+            regions = [region async for region in self._regions()]
+            with self._lock:
+                snapshot = self._store(generation, version, regions)
+        return snapshot
+
+    def _regions(self):
+        return Region.objects.using(DEFAULT_DB_ALIAS).order_by("id")
+
+    def _shared_version(self):
+        return cache.get(VERSION_KEY, 0) if settings.REGION_LOOKUP_SHARED_VERSION else None
+
+    def _store(self, generation, version, regions):
+        snapshot = Snapshot(
+            ids=[region.id for region in regions],
+            by_id={region.id: region for region in regions},
+            by_code={region.code: region for region in regions},
+            dumped={
+                region.id: region_serializer.dump_row(
+                    tuple(getattr(region, column) for column in region_serializer.columns)
+                )
+                for region in regions
+            },
+        )
+        # A write that landed while loading makes this snapshot stale already
+        if generation == self._generation:
+            self._snapshot, self._version = snapshot, version
+        return snapshot
+
+    def covering(self, ids=(), codes=(), snapshot=None):
+        """
+        The snapshot, reloaded if it lacks some of the region `ids` or `codes`
+        that exist: created by another process since it was taken. Costs one
+        query when some are missing, whether they exist or not.
+        """
+        snapshot = snapshot or self.snapshot()
+        missing = self._missing(snapshot, ids, codes)
+        if missing is not None and missing.exists():
+            self.invalidate()
+            snapshot = self.snapshot()
+        return snapshot
+
+    async def acovering(self, ids=(), codes=(), snapshot=None):
+        """covering() for async callers."""
+        snapshot = snapshot or await self.asnapshot()
+        missing = self._missing(snapshot, ids, codes)
+        if missing is not None and await missing.aexists():
+            self.invalidate()
+            snapshot = await self.asnapshot()
+        return snapshot
+
+    def _missing(self, snapshot, ids, codes):
+        ids = [region_id for region_id in ids if region_id not in snapshot.by_id]
+        codes = [code for code in codes if code not in snapshot.by_code]
+        if not ids and not codes:
+            return None
+        return self._regions().filter(Q(id__in=ids) | Q(code__in=codes))
+
+    def get(self, region_id):
+        return self.snapshot().by_id.get(region_id)
+
+    def get_by_code(self, code):
+        return self.snapshot().by_code.get(code)
+
+    def ids_for_codes(self, codes, snapshot=None):
+        by_code = (snapshot or self.snapshot()).by_code
+        return [by_code[code].id for code in codes if code in by_code]
+
+    def dump(self, region_id):
+        dumped = self.snapshot().dumped
+        if region_id not in dumped:
+            # Created by another process since the snapshot was taken
+            self.invalidate()
+            dumped = self.snapshot().dumped
+        return dict(dumped[region_id])
+
+    def dump_many(self, region_ids):
+        """
+        dump() of several regions at once, keyed by id. Regions that are not
+        on the primary either are left out: links read from a replica can
+        still point to a region whose delete has not reached it.
+        """
+        snapshot = self.snapshot()
+        if not snapshot.dumped.keys() >= set(region_ids):
+            self.invalidate()
+            snapshot = self.snapshot()
+        return self._dump_many(snapshot, region_ids)
+
+    async def adump_many(self, region_ids):
+        """dump_many() for async callers."""
+        snapshot = await self.asnapshot()
+        if not snapshot.dumped.keys() >= set(region_ids):
+            self.invalidate()
+            snapshot = await self.asnapshot()
+        return self._dump_many(snapshot, region_ids)
+
+    def _dump_many(self, snapshot, region_ids):
+        dumped = snapshot.dumped
+        return {region_id: dict(dumped[region_id]) for region_id in region_ids if region_id in dumped}
+
+    def page(self, after, limit, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        start = bisect_right(snapshot.ids, after)
+        return [snapshot.by_id[region_id] for region_id in snapshot.ids[start:start + limit]]
+
+
+region_lookup = RegionLookup()
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('regions', '0001_schema__initial_model_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='region',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 
+from django_article.models import VersionedModel
 
-class Region(models.Model):
+
+class Region(VersionedModel):
     code = models.CharField(max_length=2, unique=True)
     name = models.CharField(max_length=255)
-    
\ No newline at end of file
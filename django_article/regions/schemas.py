@@ -1,15 +1,16 @@
 from marshmallow import validate
 from marshmallow import fields
-from marshmallow import Schema
 from marshmallow.decorators import post_load
 
 from django_article.regions.models import Region
+from django_article.serializers import CompiledSerializer, Schema
 from django_article.utils import must_not_be_blank
 
 
 class RegionSchema(Schema):
     class Meta(object):
         model = Region
+        ordered = True
 
     id = fields.Integer()
     code = fields.String(required=True, validate=validate.Length(equal=2))
@@ -17,7 +18,11 @@ class RegionSchema(Schema):
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
-        region, _ = Region.objects.update_or_create(
-            id=data.pop("id", None), defaults=data
-        )
+        # The view passes the region it loaded as the "instance" context,
+        # and learns from "written" whether anything changed
+        region, created = Region.objects.update_or_create_by_id(data.pop("id", None), data, self.context.get("instance"))
+        self.context["written"] = created or bool(region.changed_fields)
         return region
+
+
+region_serializer = CompiledSerializer(RegionSchema)
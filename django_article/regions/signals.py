@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+from django_article.response_cache import response_cache
+
+
+@receiver([post_save, post_delete], sender=Region)
+def invalidate_region_lookup(sender, **kwargs):
+    region_lookup.invalidate_on_commit()
+    response_cache.bump_on_commit(Region)
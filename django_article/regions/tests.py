@@ -1,9 +1,13 @@
 import json
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from django_article.articles.models import Article
+from django_article.regions.lookup import VERSION_KEY, region_lookup
 from django_article.regions.models import Region
+from django_article.regions.schemas import RegionSchema, region_serializer
 
 
 class RegionListViewTestCase(TestCase):
@@ -52,6 +56,112 @@ class RegionListViewTestCase(TestCase):
             response.json(),
         )
 
+    def test_paginates_with_cursor(self):
+        response = self.client.get(self.url, {"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["code"] for r in response.json()], ["AL"])
+        response = self.client.get(self.url, {"limit": 1, "cursor": response["X-Next-Cursor"]})
+        self.assertEqual([r["code"] for r in response.json()], ["UK"])
+        self.assertFalse(response.has_header("X-Next-Cursor"))
+
+    def test_returns_all_regions_for_stream_mode(self):
+        expected = self.client.get(self.url).json()
+        response = self.client.get(self.url, {"stream": "true"})
+        self.assertEqual(response.json(), expected)
+
+    def test_served_from_snapshot_without_queries(self):
+        region_lookup.snapshot()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual([r["code"] for r in response.json()], ["AL", "UK"])
+        with self.assertNumQueries(0):
+            self.client.get(reverse("region", kwargs={"region_id": self.region_1.id}))
+
+    def test_sparse_fieldset(self):
+        response = self.client.get(self.url, {"fields": "code"})
+        self.assertEqual(
+            response.json(), [{"id": self.region_1.id, "code": "AL"}, {"id": self.region_2.id, "code": "UK"}]
+        )
+        self.assertNotEqual(response["ETag"], self.client.get(self.url)["ETag"])
+        response = self.client.get(reverse("region", kwargs={"region_id": self.region_1.id}), {"fields": "name"})
+        self.assertEqual(response.json(), {"id": self.region_1.id, "name": "Albania"})
+        self.assertEqual(self.client.get(self.url, {"fields": "population"}).status_code, 400)
+
+    def test_compiled_dump_is_byte_identical_to_schema(self):
+        Region.objects.create(code="TR", name="Türkiye")
+        regions = Region.objects.order_by("pk")
+        self.assertEqual(json.dumps(region_serializer.dump(regions)), json.dumps(RegionSchema(many=True).dump(regions)))
+
+
+class RegionLookupTestCase(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(code="AL", name="Albania")
+
+    def test_resolves_by_id_and_code(self):
+        self.assertEqual(region_lookup.get(self.region.id), self.region)
+        self.assertEqual(region_lookup.get_by_code("AL"), self.region)
+        self.assertIsNone(region_lookup.get_by_code("ZZ"))
+        self.assertEqual(region_lookup.ids_for_codes(["AL", "ZZ"]), [self.region.id])
+
+    def test_invalidated_by_writes(self):
+        region_lookup.snapshot()
+        self.region.name = "Republic of Albania"
+        self.region.save()
+        new_region = Region.objects.create(code="UK", name="United Kingdom")
+        self.assertEqual(region_lookup.get_by_code("AL").name, "Republic of Albania")
+        self.assertEqual(region_lookup.get_by_code("UK"), new_region)
+        new_region.delete()
+        self.assertIsNone(region_lookup.get_by_code("UK"))
+
+    def test_reloads_for_unknown_region_id(self):
+        region_lookup.snapshot()
+        # bulk_create sends no signals, like a write from another process
+        new_region, = Region.objects.bulk_create([Region(code="UK", name="United Kingdom")])
+        self.assertEqual(region_lookup.dump(new_region.id)["code"], "UK")
+
+    @override_settings(REGION_LOOKUP_SHARED_VERSION=True)
+    def test_shared_version_invalidates_other_processes(self):
+        region_lookup.invalidate()
+        region_lookup.snapshot()
+        Region.objects.filter(pk=self.region.pk).update(name="Changed elsewhere")
+        self.assertEqual(region_lookup.get(self.region.id).name, "Albania")
+        # Another process bumping the shared stamp
+        cache.incr(VERSION_KEY)
+        self.assertEqual(region_lookup.get(self.region.id).name, "Changed elsewhere")
+
+
+class RegionCreatedElsewhereTestCase(TestCase):
+    """A region written by another process, which leaves this one's snapshot stale."""
+
+    def setUp(self):
+        Region.objects.create(code="AL", name="Albania")
+        region_lookup.snapshot()
+        # bulk_create sends no signals
+        self.poland, = Region.objects.bulk_create([Region(code="PL", name="Poland")])
+        self.article = Article.objects.create(title="Pierogi")
+        Article.regions.through.objects.bulk_create([
+            Article.regions.through(article_id=self.article.id, region_id=self.poland.id),
+        ])
+
+    def test_found_by_the_region_endpoints(self):
+        response = self.client.get(reverse("articles-list"), {"region_code": "PL"})
+        self.assertEqual([article["id"] for article in response.json()], [self.article.id])
+        for name in ("region", "region-articles", "region-stats"):
+            self.assertEqual(self.client.get(reverse(name, args=(self.poland.id,))).status_code, 200, name)
+
+    def test_unknown_region_costs_one_query(self):
+        region_lookup.snapshot()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse("region", args=(999,))).status_code, 404)
+
+    def test_found_by_bulk_writes(self):
+        response = self.client.post(reverse("articles-bulk"), [
+            {"title": "Bigos", "regions": [{"id": self.poland.id}]},
+            {"title": "Zurek", "regions": [{"code": "PL", "name": "Poland"}]},
+        ], content_type="application/json")
+        self.assertEqual([result["status"] for result in response.json()], ["created", "created"])
+        self.assertEqual(Region.objects.filter(code="PL").count(), 1)
+
 
 class RegionViewTestCase(TestCase):
     def setUp(self):
@@ -92,6 +202,41 @@ class RegionViewTestCase(TestCase):
             response.json(),
         )
 
+    def test_update_query_count(self):
+        # The region and its update, in a savepoint of the test's
+        # transaction; its articles are not written
+        with self.assertNumQueries(4):
+            response = self.client.put(
+                self.url, data=json.dumps({"code": "AL", "name": "Republic of Albania"}), content_type="application/json"
+            )
+        self.assertEqual(response["X-Write"], "UPDATED")
+
+    def test_patch_updates_given_fields(self):
+        response = self.client.patch(self.url, data=json.dumps({"name": "Shqipëria"}), content_type="application/json")
+        self.assertEqual(response.json(), {"id": self.region.id, "code": "AL", "name": "Shqipëria"})
+        self.assertEqual(response["X-Write"], "UPDATED")
+
+    def test_unchanged_document_is_not_written(self):
+        for method, payload in (("put", {"code": "AL", "name": "Albania"}), ("patch", {"code": "AL"})):
+            # Only the region is read
+            with self.assertNumQueries(3):
+                response = getattr(self.client, method)(self.url, data=json.dumps(payload), content_type="application/json")
+            self.assertEqual(response["X-Write"], "UNCHANGED")
+        self.assertEqual(Region.objects.get().version, 1)
+
+    def test_conditional_get_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+        list_etag = self.client.get(reverse("regions-list"))["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(
+                self.client.get(reverse("regions-list"), HTTP_IF_NONE_MATCH=list_etag).status_code, 304
+            )
+        self.client.put(self.url, data=json.dumps({"code": "AL", "name": "Republic of Albania"}),
+                        content_type="application/json")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse("regions-list"), HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
     def test_removes_region(self):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, 200)
@@ -1,44 +1,108 @@
 import json
 
+from asgiref.sync import sync_to_async
 from marshmallow import ValidationError
+from django.db import transaction
 from django.views.generic import View
 
+from django_article.conditional import add_validators, instances_etag, not_modified, variant_etag
+from django_article.regions.lookup import region_lookup
 from django_article.regions.models import Region
-from django_article.regions.schemas import RegionSchema
-from django_article.utils import json_response
+from django_article.regions.schemas import RegionSchema, region_serializer
+from django_article.response_cache import cached_list
+from django_article.stats.counters import batched
+from django_article.utils import (
+    FieldsetError, PaginationError, build_page, conditional_json_response, json_response, parse_fieldset, parse_page,
+    wants_stream, write_headers,
+)
 
 
 class RegionsListView(View):
-    def get(self, request, *args, **kwargs):
-        return json_response(RegionSchema().dump(Region.objects.all(), many=True))
+    @cached_list(Region)
+    async def get(self, request, *args, **kwargs):
+        # Regions are a small lookup table, served from the in-process snapshot
+        try:
+            serializer = region_serializer.subset(parse_fieldset(request, RegionSchema))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        snapshot = await region_lookup.asnapshot()
+        if wants_stream(request):
+            return json_response([dump_region(snapshot, region_id, serializer) for region_id in snapshot.ids])
+        try:
+            limit, after = parse_page(request)
+        except PaginationError as e:
+            return json_response({"error": str(e)}, 400)
+        regions = region_lookup.page(after, limit + 1, snapshot)
+        etag = instances_etag(Region, limit, regions, key=serializer.etag_key)
+        response = not_modified(request, etag, None)
+        if response is None:
+            page = build_page(request, [dump_region(snapshot, region.id, serializer) for region in regions], limit)
+            response = add_validators(json_response(page.items, headers=page.headers), etag, None)
+        return response
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         try:
-            region = RegionSchema().load(json.loads(request.body))
+            region, _ = await sync_to_async(save_region)(json.loads(request.body))
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(RegionSchema().dump(region), 201)
+        return json_response(region, 201)
 
 
 class RegionView(View):
-    def dispatch(self, request, region_id, *args, **kwargs):
+    async def dispatch(self, request, region_id, *args, **kwargs):
         try:
-            self.region = Region.objects.get(pk=region_id)
-        except Region.DoesNotExist:
+            self.serializer = region_serializer.subset(parse_fieldset(request, RegionSchema))
+        except FieldsetError as e:
+            return json_response({"error": str(e)}, 400)
+        if request.method == "GET":
+            self.snapshot = await region_lookup.acovering(ids=[region_id])
+            self.region = self.snapshot.by_id.get(region_id)
+        else:
+            self.region = await Region.objects.filter(pk=region_id).afirst()
+        if self.region is None:
             return json_response({"error": "No Region matches the given query"}, 404)
         self.data = request.body and dict(json.loads(request.body), id=self.region.id)
-        return super(RegionView, self).dispatch(request, *args, **kwargs)
+        return await super(RegionView, self).dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        etag = variant_etag(self.region.etag, self.serializer.etag_key)
+        return await conditional_json_response(request, etag, self.region.updated_at, self.dump)
+
+    async def dump(self):
+        return dump_region(self.snapshot, self.region.id, self.serializer)
+
+    async def put(self, request, *args, **kwargs):
+        return await self.write()
 
-    def get(self, request, *args, **kwargs):
-        return json_response(RegionSchema().dump(self.region))
+    async def patch(self, request, *args, **kwargs):
+        return await self.write(partial=True)
 
-    def put(self, request, *args, **kwargs):
+    async def write(self, partial=False):
         try:
-            self.region = RegionSchema().load(self.data)
+            region, written = await sync_to_async(save_region)(self.data, self.region, partial)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(RegionSchema().dump(self.region))
+        return json_response(region, headers=write_headers(written))
 
-    def delete(self, request, *args, **kwargs):
-        self.region.delete()
+    async def delete(self, request, *args, **kwargs):
+        await self.region.adelete()
         return json_response()
+
+
+def dump_region(snapshot, region_id, serializer):
+    if serializer is region_serializer:
+        return dict(snapshot.dumped[region_id])
+    region = snapshot.by_id[region_id]
+    return serializer.dump_row(tuple(getattr(region, column) for column in serializer.columns))
+
+
+def save_region(data, instance=None, partial=False):
+    """
+    Loads `data` with RegionSchema, which writes through the sync ORM in
+    its post_load, in one transaction with the counters it moves. Returns
+    the dumped region and whether anything was written.
+    """
+    schema = RegionSchema(context={"instance": instance})
+    with transaction.atomic(), batched():
+        region = schema.dump(schema.load(data, partial=partial))
+    return region, schema.context["written"]
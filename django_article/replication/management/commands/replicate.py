@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django_article.replication.standin import replicate
+
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database to the DATABASE_REPLICAS, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="keep replicating, every this many seconds")
+
+    def handle(self, *args, interval=None, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas: set DJANGO_DATABASE_REPLICAS")
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                beat_at = replicate(settings.DATABASES[alias]["NAME"])
+                self.stdout.write(f"Replicated {alias} at {beat_at.isoformat()}")
+            if interval is None:
+                return
+            time.sleep(interval)
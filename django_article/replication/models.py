@@ -0,0 +1,9 @@
+from django.db import models
+
+
+class Heartbeat(models.Model):
+    """
+    The single row the primary stamps before every replication step. How
+    old the copy on a replica is tells its lag.
+    """
+    beat_at = models.DateTimeField()
@@ -0,0 +1,99 @@
+import math
+import random
+import threading
+from contextvars import ContextVar
+from time import monotonic, time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+from django_article.replication.models import Heartbeat
+
+HEARTBEAT_ID = 1
+
+# The time the reads of the current request must see the writes of: 0 for
+# any replica, the client's last write, or infinity for a request that
+# writes itself. Set by ReplicaRoutingMiddleware; None outside of requests.
+read_after = ContextVar("read_after", default=None)
+# The database every read of the current request goes to, chosen once by
+# ReplicaRoutingMiddleware so that all of them see the same state. None,
+# outside of requests (management commands, migrations, the shell), reads
+# from the primary.
+read_from = ContextVar("read_from", default=None)
+
+
+class ReplicaStatus(object):
+    """
+    The last heartbeat of every replica, as a timestamp, or None when it
+    cannot be read. Reloaded at most every REPLICA_STATUS_INTERVAL seconds
+    per process; an older heartbeat only makes a replica look further
+    behind than it is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.heartbeats = {}
+        self.checked = None
+
+    def current(self):
+        with self._lock:
+            if self.checked is not None and monotonic() - self.checked < settings.REPLICA_STATUS_INTERVAL:
+                return self.heartbeats
+        return self.refresh()
+
+    def refresh(self):
+        heartbeats = {}
+        for alias in settings.DATABASE_REPLICAS:
+            try:
+                beat_at = Heartbeat.objects.using(alias).filter(pk=HEARTBEAT_ID).values_list("beat_at", flat=True).first()
+            except DatabaseError:
+                # Not replicated yet, or unreachable
+                beat_at = None
+            heartbeats[alias] = beat_at.timestamp() if beat_at is not None else None
+        with self._lock:
+            self.heartbeats, self.checked = heartbeats, monotonic()
+        return heartbeats
+
+    def choose(self, after=None):
+        """
+        A random replica that is at most REPLICA_MAX_LAG seconds behind and
+        has every write up to `after`, else the primary. Always the primary
+        when `after` is None.
+        """
+        if not settings.DATABASE_REPLICAS or after is None or after == math.inf:
+            return DEFAULT_DB_ALIAS
+        since = max(after, time() - settings.REPLICA_MAX_LAG)
+        replicas = [
+            alias for alias, beat_at in self.current().items() if beat_at is not None and beat_at >= since
+        ]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+replica_status = ReplicaStatus()
+
+
+class ReplicaRouter(object):
+    """
+    Sends reads to the replica chosen for the current request and every
+    write to the primary (the default database).
+    """
+
+    def db_for_read(self, model, **hints):
+        # Related rows come from where the instance was read
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return read_from.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the same rows
+        return True
+
+
+def wrote_recently():
+    """Whether the client of the current request made a write the replicas may not have yet."""
+    after = read_after.get()
+    return after is not None and after > 0
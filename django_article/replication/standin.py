@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from django_article.replication.models import Heartbeat
+from django_article.replication.router import HEARTBEAT_ID
+
+
+def replicate(path):
+    """
+    Stands in for the database's own replication when running on SQLite:
+    stamps the heartbeat on the primary, then copies the whole primary
+    database over the replica file at `path` with SQLite's online backup.
+    Returns the heartbeat.
+    """
+    beat_at = timezone.now()
+    Heartbeat.objects.update_or_create(pk=HEARTBEAT_ID, defaults={"beat_at": beat_at})
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
+    return beat_at
@@ -0,0 +1,150 @@
+import math
+import os
+import sqlite3
+import tempfile
+from time import monotonic, time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from django_article.articles.models import Article
+from django_article.middleware import WRITTEN_AT_COOKIE, ReplicaRoutingMiddleware
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+from django_article.replication.router import ReplicaRouter, read_after, read_from, replica_status
+from django_article.replication.standin import replicate
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"], REPLICA_MAX_LAG=5)
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        self.now = time()
+        self.beats({"replica1": self.now - 1, "replica2": self.now - 3})
+        self.addCleanup(self.beats, {})
+
+    def beats(self, heartbeats):
+        replica_status.heartbeats, replica_status.checked = heartbeats, monotonic() if heartbeats else None
+
+    def read_db(self, after=0):
+        return {replica_status.choose(after) for _ in range(50)}
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self):
+        self.assertEqual(self.read_db(), {"replica1", "replica2"})
+        self.assertEqual(ReplicaRouter().db_for_write(Article), DEFAULT_DB_ALIAS)
+
+    def test_reads_outside_of_requests_go_to_the_primary(self):
+        # Management commands, migrations and the shell, e.g. a stats rebuild
+        self.assertEqual(self.read_db(after=None), {DEFAULT_DB_ALIAS})
+        self.assertIsNone(read_from.get())
+        self.assertEqual(ReplicaRouter().db_for_read(Article), DEFAULT_DB_ALIAS)
+
+    def test_one_request_reads_from_one_database(self):
+        # Otherwise a page's rows could come from a replica further behind
+        # than the one its validators came from
+        chosen = []
+        middleware = ReplicaRoutingMiddleware(
+            lambda request: chosen.append({ReplicaRouter().db_for_read(Article) for _ in range(20)}) or HttpResponse()
+        )
+        for _ in range(20):
+            middleware(RequestFactory().get("/articles"))
+        self.assertEqual({len(aliases) for aliases in chosen}, {1})
+        self.assertEqual(set().union(*chosen), {"replica1", "replica2"})
+
+    def test_one_async_request_reads_from_one_database(self):
+        async def view(request):
+            aliases = set()
+            for _ in range(20):
+                aliases.add(await sync_to_async(ReplicaRouter().db_for_read)(Article))
+            return HttpResponse(",".join(aliases))
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = async_to_sync(middleware)(RequestFactory().get("/articles"))
+        self.assertIn(response.content.decode(), ("replica1", "replica2"))
+
+    def test_replicas_too_far_behind_are_skipped(self):
+        self.beats({"replica1": self.now - 1, "replica2": self.now - 60})
+        self.assertEqual(self.read_db(), {"replica1"})
+        self.beats({"replica1": None, "replica2": self.now - 60})
+        self.assertEqual(self.read_db(), {DEFAULT_DB_ALIAS})
+
+    def test_reads_after_a_write_need_a_replica_that_has_it(self):
+        self.assertEqual(self.read_db(after=self.now - 2), {"replica1"})
+        self.assertEqual(self.read_db(after=self.now), {DEFAULT_DB_ALIAS})
+        self.assertEqual(self.read_db(after=math.inf), {DEFAULT_DB_ALIAS})
+
+    def test_requests_mark_what_their_reads_must_see(self):
+        seen = []
+        middleware = ReplicaRoutingMiddleware(lambda request: seen.append(read_after.get()) or HttpResponse())
+        factory = RequestFactory()
+        middleware(factory.get("/articles"))
+        middleware(factory.post("/articles"))
+        factory.cookies[WRITTEN_AT_COOKIE] = str(self.now)
+        middleware(factory.get("/articles"))
+        self.assertEqual(seen, [0, math.inf, self.now])
+        self.assertIsNone(read_after.get())
+
+    def test_writing_requests_only_use_the_primary(self):
+        # Neither replica exists: any query routed to one would fail
+        self.beats({"replica1": self.now, "replica2": self.now})
+        region_lookup.invalidate()
+        response = self.client.post(
+            reverse("articles-list"), {"title": "How to train a dog"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        written_at = float(response.cookies[WRITTEN_AT_COOKIE].value)
+        self.assertGreaterEqual(written_at, self.now)
+
+        # Until the replicas have the write, so do the client's reads, past the response cache
+        response = self.client.get(reverse("articles-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([article["title"] for article in response.json()], ["How to train a dog"])
+        self.assertNotIn("X-Cache", response)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class RegionDeletedOnThePrimaryTestCase(TestCase):
+    def test_links_to_it_are_left_out(self):
+        # Links read from a replica the delete of the region has not reached
+        albania = Region.objects.create(code="AL", name="Albania")
+        kosovo = Region.objects.create(code="XK", name="Kosovo")
+        article = Article.objects.create(title="Byrek")
+        article.regions.set([albania, kosovo])
+        self.sql("DELETE FROM regions_region WHERE id = %s", kosovo.id)
+        # The rows still pointing to it go before the constraint checks
+        self.addCleanup(self.sql, "DELETE FROM stats_regionstats WHERE region_id = %s", kosovo.id)
+        self.addCleanup(self.sql, "DELETE FROM articles_article_regions WHERE region_id = %s", kosovo.id)
+        region_lookup.invalidate()
+        for url in (reverse("articles-list"), reverse("article", args=(article.id,))):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            body = response.json()
+            regions = (body[0] if isinstance(body, list) else body)["regions"]
+            self.assertEqual([region["code"] for region in regions], ["AL"], url)
+
+    def sql(self, statement, *params):
+        with connection.cursor() as cursor:
+            cursor.execute(statement, params)
+
+
+class ReplicateTestCase(TransactionTestCase):
+    # The backup waits for the primary's open transactions: no TestCase one
+    def test_copies_the_primary_with_a_heartbeat(self):
+        Article.objects.create(title="How to train a dog")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "replica.sqlite3")
+        beat_at = replicate(path)
+
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute("SELECT title FROM articles_article").fetchall(), [("How to train a dog",)])
+        [(stamped,)] = replica.execute("SELECT beat_at FROM replication_heartbeat").fetchall()
+        self.assertEqual(stamped, beat_at.isoformat(" ").replace("+00:00", ""))
+
+    def test_lag_is_reported(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client.get(reverse("replication"))
+        self.assertEqual(response.json(), {"max_lag": 5, "replicas": []})
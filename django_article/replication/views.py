@@ -0,0 +1,21 @@
+from time import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.generic import View
+
+from django_article.replication.router import replica_status
+from django_article.utils import json_response
+
+
+class ReplicationView(View):
+    async def get(self, request, *args, **kwargs):
+        heartbeats = await sync_to_async(replica_status.refresh)()
+        now = time()
+        return json_response({
+            "max_lag": settings.REPLICA_MAX_LAG,
+            "replicas": [
+                {"alias": alias, "lag": round(now - beat_at, 3) if beat_at is not None else None}
+                for alias, beat_at in heartbeats.items()
+            ],
+        })
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http.response import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from django_article.conditional import not_modified
+from django_article.replication.router import wrote_recently
+from django_article.utils import wants_stream
+
+GENERATION_KEY = "generation:{}"
+# Comma-separated sets: the views read them in no particular order
+SET_PARAMS = ("region_code", "fields", "include")
+
+
+def normalized(name, value):
+    return ",".join(sorted(value.split(","))) if name in SET_PARAMS else value
+
+
+class ResponseCache(object):
+    """
+    Caches full list responses keyed by the normalized query parameters and
+    the generation of every model the response is built from. Writes replace
+    a model's generation with a fresh token instead of deleting entries, so
+    stale responses are simply never looked up again and age out through the
+    backend's own bounds (MAX_ENTRIES/LRU for local memory, culling for the
+    file-based backend). Tokens rather than counters also survive the
+    generation keys themselves being evicted. The generations are kept in
+    the RESPONSE_GENERATIONS_ALIAS cache, which every process must share.
+
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    @property
+    def generations_cache(self):
+        # Shared by every process, unlike the entries themselves
+        return caches[settings.RESPONSE_GENERATIONS_ALIAS]
+
+    def generations(self, models):
+        keys = [GENERATION_KEY.format(model._meta.label) for model in models]
+        generations = self.generations_cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                self.generations_cache.add(key, uuid.uuid4().hex, timeout=None)
+                generations[key] = self.generations_cache.get(key)
+        return [generations[key] for key in keys]
+
+    def bump(self, *models):
+        self.generations_cache.set_many(
+            {GENERATION_KEY.format(model._meta.label): uuid.uuid4().hex for model in models}, timeout=None
+        )
+
+    def bump_on_commit(self, *models):
+        # Right away for this connection, and again once the write is visible
+        # to everyone else, so nothing read in between stays cached.
+        self.bump(*models)
+        transaction.on_commit(lambda: self.bump(*models))
+
+    def key(self, request, models):
+        # Repeated parameters keep their order: the views read the last one
+        params = sorted(
+            (name, [normalized(name, value) for value in values]) for name, values in request.GET.lists()
+        )
+        raw = repr((request.path, params, self.generations(models)))
+        return "response:" + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "backend": settings.CACHES[settings.RESPONSE_CACHE_ALIAS]["BACKEND"],
+            "max_entries": settings.CACHES[settings.RESPONSE_CACHE_ALIAS].get("OPTIONS", {}).get("MAX_ENTRIES"),
+        }
+
+
+response_cache = ResponseCache()
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "X-Next-Cursor", "Link")
+
+
+def entry_timeout():
+    # A write bumps the generations at commit, before the replicas have it:
+    # an entry built from a replica is only trusted for as long as it lags.
+    if settings.DATABASE_REPLICAS:
+        return min(settings.RESPONSE_CACHE_TIMEOUT, settings.REPLICA_MAX_LAG)
+    return settings.RESPONSE_CACHE_TIMEOUT
+
+
+def cached_list(*models):
+    """
+    Serves an async list view's GET from the response cache. The entry is
+    keyed on the generations of `models`, every model the response is built
+    from. The cache is called synchronously: the configured backends only
+    read local memory or disk.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(self, request, *args, **kwargs):
+            # A client that just wrote must not be served what was cached
+            # from a replica without its write
+            if not settings.RESPONSE_CACHE_ENABLED or wants_stream(request) or wrote_recently():
+                return await view(self, request, *args, **kwargs)
+            key = response_cache.key(request, models)
+            entry = response_cache.cache.get(key)
+            response_cache.record(hit=entry is not None)
+            if entry is None:
+                response = await view(self, request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+                    response_cache.cache.set(key, (response.content, headers), entry_timeout())
+                response["X-Cache"] = "MISS"
+                return response
+
+            content, headers = entry
+            response = None
+            if "ETag" in headers:
+                last_modified = parse_http_date_safe(headers.get("Last-Modified", ""))
+                if last_modified is not None:
+                    last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+                response = not_modified(request, headers["ETag"], last_modified)
+            if response is None:
+                response = HttpResponse(content=content, headers=headers)
+            response["X-Cache"] = "HIT"
+            return response
+        return wrapper
+    return decorator
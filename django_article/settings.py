@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,45 +32,65 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# The API only serves JSON and needs none of the admin's apps, middleware
+# and templates. DJANGO_ADMIN=0, the default of wsgi.py and asgi.py, leaves
+# them out: workers boot faster and no request pays for sessions, users or
+# messages.
+ADMIN_ENABLED = os.environ.get('DJANGO_ADMIN', '1') == '1'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
     'django_article.articles',
     'django_article.regions',
     'django_article.authors',
+    'django_article.stats',
+    'django_article.replication',
 ]
 
 MIDDLEWARE = [
+    'django_article.middleware.InstrumentationMiddleware',
+    'django_article.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django_article.middleware.CompressionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    # 'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'django_article.urls'
-
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+TEMPLATES = []
+
+if ADMIN_ENABLED:
+    INSTALLED_APPS = [
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    ] + INSTALLED_APPS
+
+    MIDDLEWARE += [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        # 'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
+    TEMPLATES = [
+        {
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [],
+            'APP_DIRS': True,
+            'OPTIONS': {
+                'context_processors': [
+                    'django.template.context_processors.debug',
+                    'django.template.context_processors.request',
+                    'django.contrib.auth.context_processors.auth',
+                    'django.contrib.messages.context_processors.messages',
+                ],
+            },
         },
-    },
-]
+    ]
+
+ROOT_URLCONF = 'django_article.urls'
 
 WSGI_APPLICATION = 'django_article.wsgi.application'
 
@@ -76,13 +98,88 @@ WSGI_APPLICATION = 'django_article.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections are kept open for CONN_MAX_AGE seconds, which keeps SQLite's
+# page cache warm between requests, and checked before they are reused.
+# Under ASGI every request runs its queries on a thread of its own, so
+# persistent connections would pile up: asgi.py turns them off.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'django_article.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, as a comma-separated list of SQLite files that
+# `manage.py replicate` keeps in sync with the primary. Reads go to a
+# replica that is at most REPLICA_MAX_LAG seconds behind (and has the
+# client's own writes), everything else to the primary; the replicas'
+# heartbeats are checked every REPLICA_STATUS_INTERVAL seconds.
+for index, name in enumerate(filter(None, os.environ.get('DJANGO_DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = dict(DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'})
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['django_article.replication.router.ReplicaRouter']
+REPLICA_MAX_LAG = 5
+REPLICA_STATUS_INTERVAL = 1
+
+# Applied to every new connection by the django_article.sqlite3 backend.
+# WAL lets readers run while a write is in progress, and with
+# synchronous=NORMAL a commit no longer waits for an fsync (the last commits
+# can be lost on power loss, never corrupted). Negative cache_size is in KiB.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+
+# Responses are encoded to compact JSON by JSON_ENCODER; the orjson encoder
+# falls back to the stdlib one when orjson is not installed. Bodies from
+# COMPRESSION_MIN_SIZE bytes up are compressed with brotli (if installed) or
+# gzip, as negotiated through Accept-Encoding.
+JSON_ENCODER = 'django_article.encoders.orjson_encode'
+COMPRESSION_MIN_SIZE = 1024
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Cached responses are kept per process in local memory. The generation
+# tokens their keys are built from must be seen by every process, or a
+# write would only invalidate the lists of the worker that made it: they
+# live in a file-based cache all the workers of a host share. Point
+# 'response_generations' at a networked cache (e.g. Redis) when the
+# workers run on several hosts.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    'response_generations': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'DJANGO_RESPONSE_GENERATIONS_DIR', os.path.join(tempfile.gettempdir(), 'django_article_generations')
+        ),
+    },
+}
+
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_GENERATIONS_ALIAS = 'response_generations'
+RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -112,12 +209,24 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 APPEND_SLASH = False
 
+# Cursor pagination for the list endpoints
+PAGINATION_DEFAULT_LIMIT = 100
+PAGINATION_MAX_LIMIT = 1000
+
+# Rows serialized per batch by the ?stream=true list mode
+STREAMING_CHUNK_SIZE = 500
+
+# Largest batch accepted by POST /articles/bulk
+BULK_MAX_ITEMS = 5000
+
+# Share region snapshot invalidations between processes through the default
+# cache; needs a cache backend that all workers can see.
+REGION_LOOKUP_SHARED_VERSION = False
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
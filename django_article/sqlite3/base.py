@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend, tuned with the SQLITE_PRAGMAS setting once per
+    connection. With persistent connections (CONN_MAX_AGE) that is once per
+    connection, not once per request.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred BEGIN only takes the write lock on the first write. If
+        # another connection committed since the transaction's first read,
+        # SQLite fails that write with "database is locked" right away
+        # instead of waiting busy_timeout. Writes read first, so atomic()
+        # blocks take the lock up front.
+        self.cursor().execute("BEGIN IMMEDIATE")
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class StatsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'django_article.stats'
+
+    def ready(self):
+        from django_article.stats import signals  # noqa: F401
@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+TOTALS_ID = 1
+
+pending_changes = ContextVar("pending_changes", default=None)
+
+
+class Changes(object):
+    """
+    The counter changes of one write, applied with a few UPDATEs once it is
+    known: the number of articles per region and author, and the totals.
+    Regions and authors with a change of 0 only get their last activity moved.
+    """
+
+    def __init__(self):
+        self.articles = self.regions_total = self.authors_total = 0
+        self.regions = Counter()
+        self.authors = Counter()
+
+    def move_author(self, old, new):
+        if old == new:
+            if new is not None:
+                self.authors[new] += 0
+            return
+        if old is not None:
+            self.authors[old] -= 1
+        if new is not None:
+            self.authors[new] += 1
+
+    def link(self, region_ids, delta):
+        for region_id in region_ids:
+            self.regions[region_id] += delta
+
+    def merge(self, other):
+        self.articles += other.articles
+        self.regions_total += other.regions_total
+        self.authors_total += other.authors_total
+        self.regions.update(other.regions)
+        self.authors.update(other.authors)
+
+    def apply(self):
+        if not (self.articles or self.regions_total or self.authors_total or self.regions or self.authors):
+            return
+        from django_article.stats.models import AuthorStats, RegionStats, Totals
+
+        now = timezone.now()
+        # Only the totals that move, the others would cost an expression each
+        totals = {"articles": self.articles, "regions": self.regions_total, "authors": self.authors_total}
+        updated = Totals.objects.filter(pk=TOTALS_ID).update(
+            **{field: counted(field, delta) for field, delta in totals.items() if delta}, last_activity=now
+        )
+        if not updated:
+            # No counters yet: count everything, this write included
+            rebuild()
+            return
+        add(RegionStats, self.regions, now)
+        add(AuthorStats, self.authors, now)
+
+
+def submit(changes):
+    """Applies `changes`, or adds them to the ones of the enclosing `batched()` block."""
+    batch = pending_changes.get()
+    if batch is None:
+        changes.apply()
+    else:
+        batch.merge(changes)
+
+
+@contextmanager
+def batched():
+    """
+    Applies the counter changes of the writes in the block once, at its
+    end, rather than after each signal. Use inside the write's transaction.
+    """
+    changes = Changes()
+    token = pending_changes.set(changes)
+    try:
+        yield changes
+    finally:
+        pending_changes.reset(token)
+    changes.apply()
+
+
+def counted(field, delta):
+    # Clamped at 0, so a counter that drifted can not fail a write
+    return F(field) + delta if delta >= 0 else Greatest(F(field) + delta, Value(0))
+
+
+def add(model, deltas, now):
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    for delta, ids in by_delta.items():
+        updated = model.objects.filter(pk__in=ids).update(articles=counted("articles", delta), last_activity=now)
+        if updated < len(ids):
+            # Regions and authors created with bulk_create have no row yet
+            model.objects.bulk_create(
+                [model(pk=pk, articles=max(delta, 0), last_activity=now) for pk in ids], ignore_conflicts=True
+            )
+
+
+def rebuild(get_model=django_apps.get_model, batch_size=5000):
+    """
+    Recounts every counter from the articles, e.g. after a load that sent no
+    signals. Last activity is taken from the articles' `updated_at`. Also
+    run by the migration that creates the tables, with its historical models.
+    """
+    Article = get_model("articles", "Article")
+    Author = get_model("authors", "Author")
+    Region = get_model("regions", "Region")
+    Totals = get_model("stats", "Totals")
+    RegionStats = get_model("stats", "RegionStats")
+    AuthorStats = get_model("stats", "AuthorStats")
+
+    with transaction.atomic():
+        for model in (Totals, RegionStats, AuthorStats):
+            model.objects.all().delete()
+        articles = Article.objects.aggregate(count=Count("id"), last_activity=Max("updated_at"))
+        Totals.objects.create(
+            id=TOTALS_ID,
+            articles=articles["count"],
+            regions=Region.objects.count(),
+            authors=Author.objects.count(),
+            last_activity=articles["last_activity"],
+        )
+        for model, parent, key in ((RegionStats, Region, "region_id"), (AuthorStats, Author, "author_id")):
+            rows = parent.objects.annotate(count=Count("articles"), last_activity=Max("articles__updated_at"))
+            model.objects.bulk_create(
+                (
+                    model(**{key: pk}, articles=count, last_activity=last_activity)
+                    for pk, count, last_activity in rows.values_list("id", "count", "last_activity").iterator()
+                ),
+                batch_size=batch_size,
+            )
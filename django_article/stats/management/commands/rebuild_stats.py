@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from django_article.stats.counters import TOTALS_ID, rebuild
+from django_article.stats.models import Totals
+
+
+class Command(BaseCommand):
+    help = "Recounts the article counters of regions and authors, e.g. after a bulk load."
+
+    def handle(self, *args, **options):
+        rebuild()
+        totals = Totals.objects.get(pk=TOTALS_ID)
+        self.stdout.write(
+            f"Counted {totals.articles} articles, {totals.regions} regions and {totals.authors} authors"
+        )
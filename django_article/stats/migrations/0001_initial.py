@@ -0,0 +1,51 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_existing(apps, schema_editor):
+    from django_article.stats.counters import rebuild
+
+    rebuild(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('articles', '0005_article_access_path_indexes'),
+        ('authors', '0003_author_author_name_idx'),
+        ('regions', '0002_region_updated_at_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='authors.author')),
+                ('articles', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RegionStats',
+            fields=[
+                ('region', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='regions.region')),
+                ('articles', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Totals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('articles', models.PositiveIntegerField(default=0)),
+                ('regions', models.PositiveIntegerField(default=0)),
+                ('authors', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class Totals(models.Model):
+    """The single row of site-wide counts."""
+    articles = models.PositiveIntegerField(default=0)
+    regions = models.PositiveIntegerField(default=0)
+    authors = models.PositiveIntegerField(default=0)
+    last_activity = models.DateTimeField(null=True)
+
+
+class RegionStats(models.Model):
+    region = models.OneToOneField('regions.Region', primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    articles = models.PositiveIntegerField(default=0)
+    # When an article last joined or left the region
+    last_activity = models.DateTimeField(null=True)
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField('authors.Author', primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    articles = models.PositiveIntegerField(default=0)
+    # When one of the author's articles was last created, changed or deleted
+    last_activity = models.DateTimeField(null=True)
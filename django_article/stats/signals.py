@@ -0,0 +1,101 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from django_article.articles.models import Article
+from django_article.authors.models import Author
+from django_article.regions.models import Region
+from django_article.stats.counters import Changes, submit
+
+# Keeps the counters of django_article.stats in step with every write that
+# sends signals. bulk_save, which sends none, counts its own changes.
+
+
+@receiver(post_init, sender=Article)
+def remember_counted_author(sender, instance, **kwargs):
+    # The author the article is counted for, to move it if the author changes
+    instance._counted_author_id = instance.__dict__.get("author_id", DEFERRED)
+
+
+@receiver(pre_save, sender=Article)
+def load_counted_author(sender, instance, **kwargs):
+    if instance._counted_author_id is DEFERRED and "author_id" in instance.__dict__ and not instance._state.adding:
+        instance._counted_author_id = Article.objects.filter(pk=instance.pk).values_list("author_id", flat=True).first()
+
+
+@receiver(post_save, sender=Article)
+def count_saved_article(sender, instance, created, **kwargs):
+    changes = Changes()
+    if created:
+        changes.articles += 1
+    if "author_id" in instance.__dict__:
+        changes.move_author(None if created else instance._counted_author_id, instance.author_id)
+        instance._counted_author_id = instance.author_id
+    submit(changes)
+
+
+@receiver(pre_delete, sender=Article)
+def remember_deleted_article_counts(sender, instance, **kwargs):
+    if "author_id" not in instance.__dict__:
+        instance.refresh_from_db(fields=["author"])
+    instance._counted_links = list(
+        Article.regions.through.objects.filter(article_id=instance.pk).values_list("region_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Article)
+def count_deleted_article(sender, instance, **kwargs):
+    changes = Changes()
+    changes.articles -= 1
+    changes.move_author(instance.author_id, None)
+    changes.link(instance._counted_links, -1)
+    submit(changes)
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def count_region_links(sender, instance, action, reverse, pk_set, **kwargs):
+    # `instance` is the article, or the region when changed from its side
+    own, other = ("region_id", "article_id") if reverse else ("article_id", "region_id")
+    if action in ("pre_remove", "pre_clear"):
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == "pre_remove":
+            links = links.filter(**{f"{other}__in": pk_set})
+        instance._removed_links = list(links.values_list(other, flat=True))
+        return
+    if action == "post_add":
+        linked, delta = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        linked, delta = instance._removed_links, -1
+    else:
+        return
+    changes = Changes()
+    if reverse:
+        changes.link([instance.pk], delta * len(linked))
+    else:
+        changes.link(linked, delta)
+    submit(changes)
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Author)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        changes = Changes()
+        if sender is Region:
+            changes.regions_total += 1
+            changes.regions[instance.pk] += 0
+        else:
+            changes.authors_total += 1
+            changes.authors[instance.pk] += 0
+        submit(changes)
+
+
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Author)
+def count_deleted(sender, instance, **kwargs):
+    changes = Changes()
+    if sender is Region:
+        changes.regions_total -= 1
+    else:
+        changes.authors_total -= 1
+    submit(changes)
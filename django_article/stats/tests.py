@@ -0,0 +1,122 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from django_article.articles.models import Article
+from django_article.authors.models import Author
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+from django_article.stats.counters import rebuild
+from django_article.stats.models import AuthorStats, RegionStats, Totals
+
+
+class StatsViewTestCase(TestCase):
+    def setUp(self):
+        self.albania = Region.objects.create(code="AL", name="Albania")
+        self.uk = Region.objects.create(code="UK", name="United Kingdom")
+        self.henry = Author.objects.create(first_name="Henry", last_name="Benington")
+        self.luca = Author.objects.create(first_name="Luca", last_name="Amos")
+        region_lookup.invalidate()
+
+    def send(self, method, url, payload=None):
+        return self.client.generic(method, url, json.dumps(payload) if payload else "", content_type="application/json")
+
+    def stats(self, name, pk=None):
+        response = self.client.get(reverse(name, args=() if pk is None else (pk,)))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def counts(self):
+        return (
+            Totals.objects.values("articles", "regions", "authors").get(),
+            dict(RegionStats.objects.values_list("region_id", "articles")),
+            dict(AuthorStats.objects.values_list("author_id", "articles")),
+        )
+
+    def test_counts_follow_article_writes(self):
+        response = self.send("POST", reverse("articles-list"), {
+            "title": "How to train a dog", "author": {"id": self.henry.id}, "regions": [{"id": self.albania.id}],
+        })
+        url = reverse("article", args=(response.json()["id"],))
+        self.assertEqual(self.stats("region-stats", self.albania.id)["articles"], 1)
+        self.assertEqual(self.stats("author-stats", self.henry.id)["articles"], 1)
+
+        self.send("PUT", url, {"title": "How to train a dog", "author": {"id": self.luca.id}, "regions": [{"id": self.uk.id}]})
+        self.assertEqual(self.stats("region-stats", self.albania.id)["articles"], 0)
+        self.assertEqual(self.stats("region-stats", self.uk.id)["articles"], 1)
+        self.assertEqual(self.stats("author-stats", self.henry.id)["articles"], 0)
+        luca = self.stats("author-stats", self.luca.id)
+        self.assertEqual(luca["articles"], 1)
+        self.assertIsNotNone(luca["last_activity"])
+
+        self.send("DELETE", url)
+        self.assertEqual(self.stats("region-stats", self.uk.id)["articles"], 0)
+        self.assertEqual(self.stats("author-stats", self.luca.id)["articles"], 0)
+        totals = self.stats("stats")
+        self.assertEqual((totals["articles"], totals["regions"], totals["authors"]), (0, 2, 2))
+
+    def test_article_delete_counts_in_its_transaction(self):
+        article = Article.objects.create(title="Dogs", author=self.henry)
+        article.regions.set([self.albania, self.uk])
+        # The article and its links read once, the two deletes and the three
+        # counter updates, in a savepoint of the test's transaction
+        with self.assertNumQueries(9) as queries:
+            self.send("DELETE", reverse("article", args=(article.id,)))
+        self.assertTrue(queries.captured_queries[1]["sql"].startswith("SAVEPOINT"))
+        self.assertEqual(self.counts(), (
+            {"articles": 0, "regions": 2, "authors": 2},
+            {self.albania.id: 0, self.uk.id: 0},
+            {self.henry.id: 0, self.luca.id: 0},
+        ))
+
+    def test_counts_follow_bulk_writes(self):
+        article = Article.objects.create(title="Dogs", author=self.henry)
+        article.regions.set([self.albania])
+        self.send("POST", reverse("articles-bulk"), [
+            {"id": article.id, "title": "Dogs", "author": {"id": self.luca.id}, "regions": [{"code": "PL", "name": "Poland"}]},
+            {"title": "Cats", "author": {"id": self.luca.id}, "regions": [{"id": self.albania.id}]},
+        ])
+        poland = Region.objects.get(code="PL")
+        self.assertEqual(self.counts(), (
+            {"articles": 2, "regions": 3, "authors": 2},
+            {self.albania.id: 1, self.uk.id: 0, poland.id: 1},
+            {self.henry.id: 0, self.luca.id: 2},
+        ))
+
+    def test_maintained_counts_match_a_rebuild(self):
+        articles = [Article.objects.create(title=str(i), author=self.henry if i % 2 else None) for i in range(4)]
+        articles[0].regions.set([self.albania, self.uk])
+        articles[1].regions.add(self.uk)
+        self.albania.articles.add(articles[2], articles[3])
+        self.albania.articles.remove(articles[3])
+        articles[0].regions.remove(self.uk)
+        articles[1].regions.clear()
+        articles[2].author = self.luca
+        articles[2].save()
+        articles[3].delete()
+        Article.objects.only("id").get(pk=articles[1].pk).delete()
+        self.uk.delete()
+
+        maintained = self.counts()
+        rebuild()
+        self.assertEqual(self.counts(), maintained)
+
+    def test_rebuild_command_recounts_bulk_loads(self):
+        Article.objects.bulk_create([Article(title="Dogs", author=self.henry), Article(title="Cats")])
+        out = StringIO()
+        call_command("rebuild_stats", stdout=out)
+        self.assertIn("Counted 2 articles", out.getvalue())
+        self.assertEqual(self.stats("author-stats", self.henry.id)["articles"], 1)
+
+    def test_reads_are_one_query(self):
+        region_lookup.snapshot()
+        for name, pk in (("stats", None), ("region-stats", self.albania.id), ("author-stats", self.henry.id)):
+            with self.assertNumQueries(1):
+                self.stats(name, pk)
+
+    def test_unknown_region_or_author_is_404(self):
+        self.assertEqual(self.client.get(reverse("region-stats", args=(999,))).status_code, 404)
+        self.assertEqual(self.client.get(reverse("author-stats", args=(999,))).status_code, 404)
@@ -0,0 +1,43 @@
+from django.views.generic import View
+
+from django_article.authors.models import Author
+from django_article.regions.lookup import region_lookup
+from django_article.stats.counters import TOTALS_ID
+from django_article.stats.models import RegionStats, Totals
+from django_article.utils import json_response
+
+
+class StatsView(View):
+    async def get(self, request, *args, **kwargs):
+        totals = await Totals.objects.filter(pk=TOTALS_ID).afirst() or Totals()
+        return json_response({
+            "articles": totals.articles,
+            "regions": totals.regions,
+            "authors": totals.authors,
+            "last_activity": isoformat(totals.last_activity),
+        })
+
+
+class RegionStatsView(View):
+    async def get(self, request, region_id, *args, **kwargs):
+        if region_id not in (await region_lookup.acovering(ids=[region_id])).by_id:
+            return json_response({"error": "No Region matches the given query"}, 404)
+        stats = await RegionStats.objects.filter(pk=region_id).afirst() or RegionStats()
+        return json_response(dump_stats(region_id, stats.articles, stats.last_activity))
+
+
+class AuthorStatsView(View):
+    async def get(self, request, author_id, *args, **kwargs):
+        # One query: the author's existence and its counters
+        stats = await Author.objects.filter(pk=author_id).values_list("stats__articles", "stats__last_activity").afirst()
+        if stats is None:
+            return json_response({"error": "No Author matches the given query"}, 404)
+        return json_response(dump_stats(author_id, stats[0] or 0, stats[1]))
+
+
+def dump_stats(pk, articles, last_activity):
+    return {"id": pk, "articles": articles, "last_activity": isoformat(last_activity)}
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
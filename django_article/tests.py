@@ -0,0 +1,215 @@
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+
+from django_article.articles.models import Article
+from django_article.authors.models import Author
+from django_article.regions.lookup import region_lookup
+from django_article.regions.models import Region
+
+QUERY_PLANS = os.path.join(os.path.dirname(__file__), "query_plans.json")
+# Tables that must be reached through an index
+INDEXED_TABLES = ("articles_article", "articles_article_regions", "regions_region", "authors_author")
+
+ARTICLE = {"title": "How to train a dog", "content": "Know the tricks", "regions": [{"id": 1}], "author": {"id": 3}}
+REGION = {"name": "Poland", "code": "PL"}
+AUTHOR = {"first_name": "Mariana", "last_name": "Johnson"}
+
+# (url name, url args, method, query string, body) for every route
+REQUESTS = [
+    ("articles-list", (), "GET", "", None),
+    ("articles-list", (), "GET", "limit=2&cursor=eyJpZCI6IDJ9", None),
+    ("articles-list", (), "GET", "region_code=AL,UK", None),
+    ("articles-list", (), "GET", "region_code=AL,UK&region_match=any", None),
+    ("articles-list", (), "GET", "region_code=AL&region_match=none", None),
+    ("articles-list", (), "GET", "fields=id,title", None),
+    ("articles-list", (), "GET", "include=author", None),
+    ("articles-list", (), "GET", "q=dog", None),
+    ("articles-list", (), "GET", "q=dog&region_code=AL", None),
+    ("articles-list", (), "GET", "stream=true", None),
+    ("articles-list", (), "POST", "", ARTICLE),
+    ("articles-bulk", (), "POST", "", [dict(ARTICLE, id=1), dict(ARTICLE, regions=[{"code": "PL", "name": "Poland"}])]),
+    ("article", (2,), "GET", "", None),
+    ("article", (2,), "GET", "fields=title", None),
+    ("article", (2,), "PUT", "", ARTICLE),
+    ("article", (2,), "PATCH", "", {"title": "How to train a cat"}),
+    ("article", (2,), "DELETE", "", None),
+    ("regions-list", (), "GET", "", None),
+    ("regions-list", (), "POST", "", REGION),
+    ("region", (2,), "GET", "", None),
+    ("region", (2,), "PUT", "", REGION),
+    ("region", (2,), "PATCH", "", {"name": "Polska"}),
+    ("region", (2,), "DELETE", "", None),
+    ("region-articles", (2,), "GET", "", None),
+    ("region-articles", (2,), "GET", "limit=1&cursor=eyJpZCI6IDJ9", None),
+    ("region-stats", (2,), "GET", "", None),
+    ("authors-list", (), "GET", "", None),
+    ("authors-list", (), "GET", "fields=first_name", None),
+    ("authors-list", (), "POST", "", AUTHOR),
+    ("author", (3,), "GET", "", None),
+    ("author", (3,), "PUT", "", AUTHOR),
+    ("author", (3,), "PATCH", "", {"last_name": "Jones"}),
+    ("author", (3,), "DELETE", "", None),
+    ("author-articles", (3,), "GET", "", None),
+    ("author-articles", (3,), "GET", "limit=1&cursor=eyJpZCI6IDJ9", None),
+    ("author-stats", (3,), "GET", "", None),
+    ("stats", (), "GET", "", None),
+    ("replication", (), "GET", "", None),
+    ("cache-stats", (), "GET", "", None),
+    ("metrics", (), "GET", "", None),
+]
+
+# Full scans that are the point of the request, by request and table
+APPROVED_SCANS = {
+    # The whole collection is streamed in id order
+    "GET /articles?stream=true": {"articles_article"},
+}
+
+
+def request_key(name, args, method, query):
+    return f"{method} {reverse(name, args=args)}" + (f"?{query}" if query else "")
+
+
+def aliases(sql):
+    """Maps the table aliases of `sql` (Django's T2, U0, ...) to their tables."""
+    found = {table: table for table in INDEXED_TABLES}
+    found.update((alias, table) for table, alias in re.findall(r'"(\w+)" (\w+)', sql) if table in INDEXED_TABLES)
+    return found
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Runs every route against a small seeded database, captures its SQL and
+    checks the EXPLAIN QUERY PLAN of every statement: none may fully scan
+    one of INDEXED_TABLES unless approved above, and the plans must match
+    the snapshot in query_plans.json so that plan changes show up in
+    review. After an intended change, approve the new plans with
+
+        UPDATE_QUERY_PLANS=1 python manage.py test django_article.tests
+    """
+    maxDiff = None
+
+    @classmethod
+    def setUpTestData(cls):
+        regions = Region.objects.bulk_create(
+            [Region(code=code, name=name) for code, name in (("AL", "Albania"), ("UK", "United Kingdom"), ("TR", "Turkey"))]
+        )
+        authors = Author.objects.bulk_create(
+            [Author(first_name=first, last_name=last) for first, last in (("Luca", "Amos"), ("Diego", "Tanner"), ("Livia", "Hobbs"))]
+        )
+        for i in range(6):
+            article = Article.objects.create(
+                title=f"Dog article {i}", content="About dogs", author=authors[i % 3] if i % 2 else None
+            )
+            article.regions.set(regions[:i % 3 + 1])
+
+    def capture(self, name, args, method, query, body):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        # Regions come from the snapshot, which loads the whole (small) table once
+        region_lookup.invalidate()
+        region_lookup.snapshot()
+        path = reverse(name, args=args) + (f"?{query}" if query else "")
+        with transaction.atomic(), connection.execute_wrapper(record):
+            response = self.client.generic(
+                method, path, json.dumps(body) if body is not None else "", content_type="application/json"
+            )
+            if response.streaming:
+                b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, path)
+        return statements
+
+    def explain(self, statements):
+        plans = []
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plans.append({
+                    "sql": sql.replace("%s", "?"),
+                    "plan": [detail for *_, detail in cursor.fetchall()],
+                })
+        return plans
+
+    def full_scans(self, plans):
+        scans = set()
+        for query in plans:
+            tables = aliases(query["sql"])
+            for detail in query["plan"]:
+                match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+                if match and match.group(1) in tables:
+                    scans.add(tables[match.group(1)])
+        return scans
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_query_plans(self):
+        captured = {}
+        for name, args, method, query, body in REQUESTS:
+            key = request_key(name, args, method, query)
+            with self.subTest(key):
+                captured[key] = self.explain(self.capture(name, args, method, query, body))
+                scans = self.full_scans(captured[key]) - APPROVED_SCANS.get(key, set())
+                self.assertFalse(scans, f"{key} scans {', '.join(sorted(scans))} in full")
+
+        snapshot = {"sqlite": sqlite3.sqlite_version, "requests": captured}
+        if os.environ.get("UPDATE_QUERY_PLANS"):
+            with open(QUERY_PLANS, "w") as f:
+                json.dump(snapshot, f, indent=2)
+                f.write("\n")
+            return
+        with open(QUERY_PLANS) as f:
+            approved = json.load(f)
+        if approved["sqlite"] != sqlite3.sqlite_version:
+            self.skipTest(f"the approved plans are from SQLite {approved['sqlite']}")
+        for key in captured:
+            with self.subTest(key):
+                self.assertEqual(captured[key], approved["requests"].get(key), "plans changed, see the docstring")
+        self.assertEqual(captured.keys(), approved["requests"].keys())
+
+    def test_every_route_is_covered(self):
+        routes = {pattern.name for pattern in get_resolver().url_patterns if getattr(pattern, "name", None)}
+        self.assertEqual(routes - {name for name, *_ in REQUESTS}, set())
+
+
+class SQLitePragmasTestCase(TestCase):
+    def test_new_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            values = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("synchronous", "busy_timeout", "cache_size", "temp_store")
+            }
+        # NORMAL and MEMORY are 1 and 2; the in-memory test database has no WAL
+        self.assertEqual(values, {"synchronous": 1, "busy_timeout": 5000, "cache_size": -64000, "temp_store": 2})
+
+
+class APIProfileTestCase(TestCase):
+    def test_serves_without_the_admin_stack(self):
+        # A fresh interpreter: the settings are read once per process
+        script = (
+            "import io, sys\n"
+            "from django_article.wsgi import application\n"
+            "environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/metrics', 'SERVER_NAME': 'localhost',"
+            " 'SERVER_PORT': '80', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http'}\n"
+            "statuses = []\n"
+            "b''.join(application(environ, lambda status, headers: statuses.append(status)))\n"
+            "print(statuses[0], sorted(m for m in sys.modules if m.startswith('django.contrib')))\n"
+        )
+        env = {key: value for key, value in os.environ.items() if key not in ("DJANGO_ADMIN", "DJANGO_SETTINGS_MODULE")}
+        result = subprocess.run(
+            [sys.executable, "-c", script], env=env, cwd=os.path.dirname(os.path.dirname(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "200 OK []")
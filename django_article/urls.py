@@ -13,19 +13,37 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 
-from django_article.articles.views import ArticleView, ArticlesListView
+from django_article.articles.views import (
+    ArticleView, ArticlesBulkView, ArticlesListView, AuthorArticlesView, RegionArticlesView,
+)
 from django_article.regions.views import RegionView, RegionsListView
 from django_article.authors.views import AuthorView, AuthorsListView
+from django_article.replication.views import ReplicationView
+from django_article.stats.views import AuthorStatsView, RegionStatsView, StatsView
+from django_article.views import MetricsView, ResponseCacheStatsView
 
 urlpatterns = [
-    path("admin", admin.site.urls),
     path("articles", ArticlesListView.as_view(), name="articles-list"),
+    path("articles/bulk", ArticlesBulkView.as_view(), name="articles-bulk"),
     path("articles/<int:article_id>", ArticleView.as_view(), name="article"),
     path("regions", RegionsListView.as_view(), name="regions-list"),
     path("regions/<int:region_id>", RegionView.as_view(), name="region"),
+    path("regions/<int:region_id>/articles", RegionArticlesView.as_view(), name="region-articles"),
+    path("regions/<int:region_id>/stats", RegionStatsView.as_view(), name="region-stats"),
     path("authors", AuthorsListView.as_view(), name="authors-list"),
     path("authors/<int:author_id>", AuthorView.as_view(), name="author"),
+    path("authors/<int:author_id>/articles", AuthorArticlesView.as_view(), name="author-articles"),
+    path("authors/<int:author_id>/stats", AuthorStatsView.as_view(), name="author-stats"),
+    path("stats", StatsView.as_view(), name="stats"),
+    path("replication", ReplicationView.as_view(), name="replication"),
+    path("cache/stats", ResponseCacheStatsView.as_view(), name="cache-stats"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin", admin.site.urls))
@@ -1,16 +1,223 @@
+import base64
+import binascii
 import json
-from django.http.response import HttpResponse
+from collections import namedtuple
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http.response import HttpResponse, StreamingHttpResponse
 from marshmallow import ValidationError
 
+from django_article.conditional import add_validators, not_modified, page_etag
+from django_article.encoders import get_encoder
+from django_article.instrumentation import timed
+
+Page = namedtuple("Page", ["items", "next_cursor", "headers"])
+SQLITE_INTEGER_LIMIT = 2 ** 63
+
+
+class PaginationError(Exception):
+    pass
+
+
+class FieldsetError(Exception):
+    pass
+
 
 def must_not_be_blank(data):
     if not data:
         raise ValidationError("Data not provided.")
 
 
-def json_response(data=None, status=200):
+def must_fit_sqlite_integer(data):
+    # Larger ids fail in the driver with an OverflowError, not a lookup miss
+    if not -SQLITE_INTEGER_LIMIT <= data < SQLITE_INTEGER_LIMIT:
+        raise ValidationError("Id out of range.")
+
+
+def json_response(data=None, status=200, headers=None):
     if data is None:
         data = {}
-    return HttpResponse(
-        content=json.dumps(data), status=status, content_type="application/json"
-    )
+    with timed("encode"):
+        content = get_encoder()(data)
+    return HttpResponse(content=content, status=status, content_type="application/json", headers=headers)
+
+
+def write_headers(written):
+    """Tells the client whether a PUT or PATCH changed anything."""
+    return {"X-Write": "UPDATED" if written else "UNCHANGED"}
+
+
+async def conditional_json_response(request, etag, last_modified, dump, headers=None):
+    """
+    Answers with a 304 when the client's copy matches the validators, and
+    only awaits `dump()` to build the body otherwise.
+    """
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = add_validators(json_response(await dump(), headers=headers), etag, last_modified)
+    return response
+
+
+def parse_fieldset(request, schema_cls, relations=()):
+    """
+    Returns the top-level fields requested through `?fields=&include=`, in
+    the schema's order, or None for the full representation. `fields` picks
+    any fields, `include` adds relations to them (or to every plain field
+    when `fields` is absent). `id` is always part of the fieldset.
+    """
+    fields = [name for name in request.GET.get("fields", "").split(",") if name]
+    include = [name for name in request.GET.get("include", "").split(",") if name]
+    if not fields and not include:
+        return None
+    names = list(schema_cls().dump_fields)
+    unknown = [name for name in fields if name not in names] + [name for name in include if name not in relations]
+    if unknown:
+        raise FieldsetError(f"Unknown field(s): {', '.join(unknown)}")
+    selected = set(fields or [name for name in names if name not in relations]) | set(include) | {"id"}
+    return tuple(name for name in names if name in selected)
+
+
+def wants_stream(request):
+    return request.GET.get("stream", "").lower() in ("1", "true")
+
+
+def stream_json_response(request, queryset, serializer, status=200):
+    """
+    Streams `queryset` as a JSON array. Rows are read in chunks from one
+    `iterator()` and dumped one batch at a time by the compiled `serializer`,
+    so memory stays bounded by the batch size and the first bytes are sent
+    before the last row is read. The body is an async iterator under ASGI
+    and a plain one under WSGI, which would otherwise buffer it whole.
+    """
+    queryset = queryset.order_by("pk")
+    chunk_size = settings.STREAMING_CHUNK_SIZE
+    if isinstance(request, ASGIRequest):
+        content = _aiter_json_array(queryset, serializer, chunk_size)
+    else:
+        content = _iter_json_array(queryset, serializer, chunk_size)
+    return StreamingHttpResponse(content, status=status, content_type="application/json")
+
+
+def _iter_json_array(queryset, serializer, chunk_size):
+    rows = serializer.values(queryset).iterator(chunk_size=chunk_size)
+    encode = get_encoder()
+    yield b"["
+    separator = b""
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        items = serializer.dump_rows(batch)
+        with timed("encode"):
+            data = encode(items)
+        yield separator + data[1:-1]
+        separator = b","
+    yield b"]"
+
+
+async def _aiter_json_array(queryset, serializer, chunk_size):
+    # QuerySet.aiterator() runs values_list() queries in the event loop on
+    # Django 4.2, so the sync iterator is advanced one chunk at a time instead.
+    rows = serializer.values(queryset).iterator(chunk_size=chunk_size)
+    next_batch = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    encode = get_encoder()
+    yield b"["
+    separator = b""
+    while True:
+        batch = await next_batch()
+        if not batch:
+            break
+        items = await serializer.adump_rows(batch)
+        with timed("encode"):
+            data = encode(items)
+        yield separator + data[1:-1]
+        separator = b","
+    yield b"]"
+
+
+def encode_cursor(last_id, rank=None):
+    position = {"id": last_id} if rank is None else {"id": last_id, "rank": rank}
+    raw = json.dumps(position).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ranked=False):
+    """Returns the cursor's last id, or its `(rank, last_id)` when `ranked`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        last_id = position["id"]
+        rank = position["rank"] if ranked else None
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if type(last_id) != int or ranked and type(rank) not in (int, float):
+        raise PaginationError("Invalid cursor")
+    # Larger ints overflow SQLite's INTEGER when bound to the query
+    if not 0 <= last_id < SQLITE_INTEGER_LIMIT or type(rank) == int and abs(rank) >= SQLITE_INTEGER_LIMIT:
+        raise PaginationError("Invalid cursor")
+    return (rank, last_id) if ranked else last_id
+
+
+def parse_page(request, ranked=False):
+    """
+    Returns the `(limit, after)` requested through `?limit=&cursor=`, `after`
+    being the last id (0 on the first page), or `(rank, last_id)` (None on
+    the first page) when `ranked`.
+    """
+    try:
+        limit = int(request.GET.get("limit", settings.PAGINATION_DEFAULT_LIMIT))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if not 1 <= limit <= settings.PAGINATION_MAX_LIMIT:
+        raise PaginationError(f"limit must be between 1 and {settings.PAGINATION_MAX_LIMIT}")
+    cursor = request.GET.get("cursor")
+    if not cursor:
+        return limit, None if ranked else 0
+    return limit, decode_cursor(cursor, ranked)
+
+
+def build_page(request, items, limit, ranked=False):
+    """Trims the `limit + 1` dumped `items` to a Page with the next cursor headers."""
+    if len(items) <= limit:
+        return Page(items, None, {})
+
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]["id"], items[-1]["rank"] if ranked else None)
+    params = request.GET.copy()
+    params["cursor"] = next_cursor
+    next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return Page(items, next_cursor, {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'})
+
+
+async def paginated_response(request, queryset, serializer, keyset=None):
+    """
+    Keyset pagination ordered by primary key. Rows are fetched with a
+    `WHERE id > <cursor>` range scan, so every page costs the same no matter
+    how deep the client pages, and at most `limit + 1` rows are loaded and
+    dumped by the compiled `serializer`. The page's validators are checked
+    first, so an unchanged page is answered with a 304 before any dumping.
+
+    `keyset(after, relations)` replaces the range scan when another index
+    holds the rows in id order: it returns the `validators(relations)` rows
+    after `after`, ordered by id.
+    """
+    try:
+        limit, after = parse_page(request)
+    except PaginationError as e:
+        return json_response({"error": str(e)}, 400)
+    if keyset is None:
+        page_qs = serializer.validators(queryset.filter(pk__gt=after).order_by("pk"))
+    else:
+        page_qs = keyset(after, serializer.embedded)
+    validators = [row async for row in page_qs[:limit + 1]]
+    etag = page_etag(queryset.model, limit, validators, key=serializer.etag_key)
+    response = not_modified(request, etag, None)
+    if response is None:
+        # The filters already ran once, so the page is loaded by primary key
+        rows = queryset.model._default_manager.filter(pk__in=[row[0] for row in validators]).order_by("pk")
+        page = build_page(request, await serializer.adump(rows), limit)
+        response = add_validators(json_response(page.items, headers=page.headers), etag, None)
+    return response
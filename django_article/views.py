@@ -0,0 +1,16 @@
+from django.http.response import HttpResponse
+from django.views.generic import View
+
+from django_article.instrumentation import metrics
+from django_article.response_cache import response_cache
+from django_article.utils import json_response
+
+
+class ResponseCacheStatsView(View):
+    def get(self, request, *args, **kwargs):
+        return json_response(response_cache.stats())
+
+
+class MetricsView(View):
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
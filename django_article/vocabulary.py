@@ -0,0 +1,12 @@
+"""What synthetic datasets are made of, for the seed script and the benchmarks."""
+import string
+from itertools import product
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+    "et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip "
+    "ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum fugiat nulla"
+).split()
+FIRST_NAMES = ("Henry", "Chelsy", "Tomas", "Jonny", "Deborah", "Charles", "Livia", "Luca", "Diego", "Russell")
+LAST_NAMES = ("Benington", "Schmidt", "Fulton", "Calvert", "Glenn", "Monroe", "Hobbs", "Amos", "Tanner", "Wormald")
+REGION_CODES = ["".join(code) for code in product(string.ascii_uppercase, repeat=2)]
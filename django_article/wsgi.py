@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_article.settings')
+# The API profile: see ADMIN_ENABLED in the settings
+os.environ.setdefault('DJANGO_ADMIN', '0')
 
 application = get_wsgi_application()
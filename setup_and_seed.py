@@ -1,37 +1,264 @@
-import django
+"""
+Migrates the database and seeds it. Without options a handful of fixed rows
+is created. Given sizes, a deterministic synthetic dataset is bulk loaded
+instead, e.g.
+
+    python setup_and_seed.py --articles 5_000_000 --regions 250 --authors 100_000 --workers 8
+
+Articles are generated in shards of `--batch-size` by `--workers`
+processes. Each one bulk loads its shards into scratch databases, which this
+process, the only writer of the real one, copies over in id order. A shard
+is seeded from `--seed` and its position, so the data does not depend on
+the number of workers.
+"""
+import argparse
 import os
+import random
 import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_article.settings")
 sys.path.append(os.path.join(os.path.realpath(os.path.dirname(__file__)), "..", ".."))
-django.setup()
-
-from django_article.articles.models import Article
-from django_article.regions.models import Region
-from django_article.authors.models import Author
-from django.core import management
-
-# Migrate
-management.call_command("migrate", no_input=True)
-# Seed
-Article.objects.create(title="Fake Article", content="Fake Content").regions.set(
-    [
-        Region.objects.create(code="AL", name="Albania"),
-        Region.objects.create(code="UK", name="United Kingdom"),
-    ]
-)
-Article.objects.create(title="Fake Article", content="Fake Content")
-Article.objects.create(title="Fake Article", content="Fake Content")
-Article.objects.create(title="Fake Article", content="Fake Content")
-Article.objects.create(title="Fake Article", content="Fake Content").regions.set(
-    [
-        Region.objects.create(code="AU", name="Austria"),
-        Region.objects.create(code="US", name="United States of America"),
-    ]
-)
-
-Author.objects.create(first_name="Russell", last_name="Wormald")
-Author.objects.create(first_name="Livia", last_name="Hobbs")
-Author.objects.create(first_name="Luca", last_name="Amos")
-author = Author.objects.create(first_name="Diego", last_name="Tanner")
-Article.objects.create(title="Test Article", content="Test Content", author=author)
+
+
+def seed_fixtures():
+    from django_article.articles.models import Article
+    from django_article.authors.models import Author
+    from django_article.regions.models import Region
+
+    Article.objects.create(title="Fake Article", content="Fake Content").regions.set(
+        [
+            Region.objects.create(code="AL", name="Albania"),
+            Region.objects.create(code="UK", name="United Kingdom"),
+        ]
+    )
+    Article.objects.create(title="Fake Article", content="Fake Content")
+    Article.objects.create(title="Fake Article", content="Fake Content")
+    Article.objects.create(title="Fake Article", content="Fake Content")
+    Article.objects.create(title="Fake Article", content="Fake Content").regions.set(
+        [
+            Region.objects.create(code="AU", name="Austria"),
+            Region.objects.create(code="US", name="United States of America"),
+        ]
+    )
+
+    Author.objects.create(first_name="Russell", last_name="Wormald")
+    Author.objects.create(first_name="Livia", last_name="Hobbs")
+    Author.objects.create(first_name="Luca", last_name="Amos")
+    author = Author.objects.create(first_name="Diego", last_name="Tanner")
+    Article.objects.create(title="Test Article", content="Test Content", author=author)
+
+
+SHARD = "shard"
+
+
+def start_worker(schema):
+    """Sets up a worker process, with the `shard` database alias it loads into."""
+    django.setup()
+    from django.db import connections
+
+    connections.databases[SHARD] = dict(connections.databases["default"], NAME="")
+    start_worker.schema = schema
+
+
+def load_shard(shard):
+    """
+    Generates the articles with ids in `[start, stop)` and their region
+    links, bulk loads them into a new scratch database in `directory` and
+    returns its path.
+    """
+    from django.db import connections, transaction
+
+    from django_article.articles.models import Article
+    from django_article.vocabulary import WORDS
+
+    start, stop, seed, regions, authors, fanout, directory = shard
+    rng = random.Random(f"{seed}:{start}")
+    articles, links = [], []
+    for i in range(start, stop):
+        articles.append(Article(
+            id=i,
+            title=f"Article {i} {' '.join(rng.sample(WORDS, 4))}",
+            content=" ".join(rng.choices(WORDS, k=60)),
+            author_id=rng.randint(1, authors) if authors and rng.random() < 0.9 else None,
+        ))
+        links.extend((i, region_id) for region_id in rng.sample(range(1, regions + 1), fanout))
+
+    path = os.path.join(directory, f"{start}.sqlite3")
+    connection = connections[SHARD]
+    connection.settings_dict["NAME"] = path
+    with connection.cursor() as cursor:
+        # A scratch file: no journal, no fsync. Regions and authors only
+        # exist in the real database, so foreign keys are not checked here.
+        cursor.execute("PRAGMA journal_mode = OFF")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        for sql in start_worker.schema:
+            cursor.execute(sql)
+    with transaction.atomic(using=SHARD):
+        Article.objects.using(SHARD).bulk_create(articles)
+        # The through model is a plain (id, article_id, region_id) table:
+        # the links go straight in, without model instances.
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO "{Article.regions.through._meta.db_table}" ("article_id", "region_id") VALUES (%s, %s)',
+                links,
+            )
+    connection.close()
+    return path, len(articles), len(links)
+
+
+@contextmanager
+def deferred_indexes(connection, tables):
+    """
+    Drops the secondary indexes and triggers of `tables` for the duration of
+    a bulk load and creates them again afterwards: one sort per index is
+    much cheaper than updating it on every insert. The search index, which
+    the triggers would have maintained, is rebuilt in one pass too.
+    """
+    from django_article.articles.models import SEARCH_TABLE
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+            f"AND sql IS NOT NULL AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables,
+        )
+        schema = cursor.fetchall()
+        for kind, name, _ in schema:
+            cursor.execute(f'DROP {kind.upper()} "{name}"')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, _, sql in schema:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+class Progress(object):
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rows = {}
+
+    def add(self, table, count):
+        self.rows[table] = self.rows.get(table, 0) + count
+
+    def report(self, label):
+        elapsed = time.perf_counter() - self.start
+        total = sum(self.rows.values())
+        counts = ", ".join(f"{count:,} {table}" for table, count in self.rows.items())
+        print(f"{label}: {counts} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)", flush=True)
+
+
+def seed_synthetic(articles, regions, authors, fanout=2, workers=1, seed=0, batch_size=50_000):
+    from django.db import connection, transaction
+
+    from django_article.articles.models import Article
+    from django_article.authors.models import Author
+    from django_article.regions.lookup import region_lookup
+    from django_article.regions.models import Region
+    from django_article.response_cache import response_cache
+    from django_article.stats.counters import rebuild
+    from django_article.vocabulary import FIRST_NAMES, LAST_NAMES, REGION_CODES
+
+    tables = [Article._meta.db_table, Article.regions.through._meta.db_table]
+    progress = Progress()
+    rng = random.Random(seed)
+    with transaction.atomic():
+        Region.objects.bulk_create(
+            [Region(id=i + 1, code=code, name=f"Region {code}") for i, code in enumerate(REGION_CODES[:regions])]
+        )
+        Author.objects.bulk_create(
+            [
+                Author(id=i + 1, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+                for i in range(authors)
+            ],
+            batch_size=batch_size,
+        )
+    progress.add("regions", regions)
+    progress.add("authors", authors)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join(['%s'] * len(tables))})",
+            tables,
+        )
+        schema = [sql for sql, in cursor.fetchall()]
+    with tempfile.TemporaryDirectory() as directory, deferred_indexes(connection, tables):
+        shards = [
+            (start, min(start + batch_size, articles + 1), seed, regions, authors, min(fanout, regions), directory)
+            for start in range(1, articles + 1, batch_size)
+        ]
+        with Pool(workers, start_worker, (schema,)) as pool:
+            for i, (path, article_count, link_count) in enumerate(pool.imap(load_shard, shards), 1):
+                # ATTACH is not allowed inside a transaction, so every shard
+                # is copied in a transaction of its own.
+                with connection.cursor() as cursor:
+                    cursor.execute("ATTACH DATABASE %s AS shard", [path])
+                    with transaction.atomic():
+                        cursor.execute(f'INSERT INTO "{tables[0]}" SELECT * FROM shard."{tables[0]}"')
+                        cursor.execute(
+                            f'INSERT INTO "{tables[1]}" ("article_id", "region_id") '
+                            f'SELECT "article_id", "region_id" FROM shard."{tables[1]}" ORDER BY "id"'
+                        )
+                    cursor.execute("DETACH DATABASE shard")
+                os.remove(path)
+                progress.add("articles", article_count)
+                progress.add("article regions", link_count)
+                if i % 20 == 0:
+                    progress.report("  loaded")
+        progress.report("loaded")
+    progress.report("indexed")
+    # Bulk loads send no signals, so the counters are counted afresh
+    rebuild()
+    progress.report("counted")
+
+    region_lookup.invalidate()
+    response_cache.bump(Article, Author, Region)
+
+
+def main():
+    from django_article.vocabulary import REGION_CODES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, help="seed a synthetic dataset of this many articles")
+    parser.add_argument("--regions", type=int, default=50)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=2, help="regions per article")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not 0 < args.regions <= len(REGION_CODES):
+        parser.error(f"--regions must be between 1 and {len(REGION_CODES)}")
+
+    django.setup()
+    from django.core import management
+    from django.db import connection
+
+    from django_article.articles.models import Article
+    from django_article.authors.models import Author
+    from django_article.regions.models import Region
+
+    management.call_command("migrate", no_input=True)
+    if args.articles is None:
+        seed_fixtures()
+        return
+    if connection.vendor != "sqlite":
+        parser.error("synthetic data can only be loaded into SQLite")
+    if any(model.objects.exists() for model in (Article, Author, Region)):
+        parser.error("the database is not empty, synthetic data is only loaded into a new one")
+    seed_synthetic(
+        args.articles, args.regions, args.authors, fanout=args.fanout, workers=args.workers,
+        seed=args.seed, batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()